@@ -0,0 +1,31 @@
+#!/bin/sh
+# precompile the modules to .mpy bytecode [so that they are only loaded at import, rather than parsed and compiled on every boot]
+#
+# usage: ./build_mpy.sh [output dir (default: build)]
+#        then upload the contents of the output dir to the board, e.g.
+#            mpremote cp -r build/modules build/lib :
+#
+# NOTE: 1. main.py, boot.py and modules/config.py are kept as .py [main.py and boot.py are run as source by the firmware anyway;
+#          config.py is small and is rewritten on the board by the 'config' command]
+#       2. micropython imports 'x.py' ahead of 'x.mpy' in the same directory; so the .py sources already on the board must be
+#          removed, or the uploaded .mpy files are never loaded:
+#              for f in modules/*.py lib/*.py; do [ "$f" = modules/config.py ] || mpremote rm ":$f"; done
+#          likewise, an OTA update of a module (which downloads its .py) shadows its precompiled .mpy again [so the update takes
+#          effect, but runs from source until its .py is removed on the next upload of a build]
+#       3. -march is needed for the @micropython.native functions [xtensawin = esp32]
+#       4. -O3 strips the asserts and the line numbers of the tracebacks
+set -e
+
+OUT=${1:-build}
+MARCH=${MARCH:-xtensawin}
+
+mkdir -p "$OUT/modules" "$OUT/lib"
+
+for src in modules/*.py lib/*.py; do
+    [ "$src" = "modules/config.py" ] && continue
+    mpy-cross -O3 -march="$MARCH" -o "$OUT/${src%.py}.mpy" "$src"
+done
+cp modules/config.py "$OUT/modules/config.py"
+
+echo "precompiled modules written to $OUT/"
+echo "NOTE: remove the matching .py files from the board, or the .mpy files are not loaded [see the note above]"
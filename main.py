@@ -5,15 +5,19 @@
 #       cache of the previous api call and only make the api calls each 10 minute.
 #         Although real time weather data would not be as real but it is alright.
 
-# Improvements:
-# 1. implement a watchdog timer
-# 2. find a better way to retry update ntptime because ISR is too complicated and time consuming right now
-
+import micropython
+from micropython import const
+# reserve memory for exception info raised inside ISRs/timer callbacks (e.g. ds3231 alarm, led timers);
+# without it, such exceptions can not be reported since heap allocation is not allowed there
+micropython.alloc_emergency_exception_buf(128)
 
 import machine
-from time import sleep, localtime, mktime, time
-import urequests
-from ntptime import settime
+import esp32
+import os
+from time import sleep, sleep_ms, localtime, mktime, time, ticks_ms, ticks_diff, ticks_add
+import ustruct
+import uselect
+from random import randint
 
 import gc
 gc.collect()
@@ -28,28 +32,122 @@ from sensors_handler import Sensors
 import utils
 import config # configuration file
 from custom_exceptions import SetupError, MQTTPublishingError
-from download_file import dwnld_and_update
 from led import LED
 from ds3231rtc import ds3231
 
 from simple_logging import Logger  # Import the Logger class
+from http_session import Session, split_url, build_get_request
 
 # Topics/Feeds
-FEED_AHT_TEMP = config.mqtt[config.BROKER]["feeds"]["aht"]["temp"]
-FEED_AHT_HUM = config.mqtt[config.BROKER]["feeds"]["aht"]["hum"]
-FEED_OUT_TEMP = config.mqtt[config.BROKER]["feeds"]["out"]["temp"]
-FEED_OUT_FEELS_LIKE_TEMP = config.mqtt[config.BROKER]["feeds"]["out"]["feels_like_temp"]
-FEED_OUT_HUM = config.mqtt[config.BROKER]["feeds"]["out"]["hum"]
-FEED_OUT_PRESS = config.mqtt[config.BROKER]["feeds"]["out"]["press"]
-FEED_BMP_TEMP = config.mqtt[config.BROKER]["feeds"]["bmp"]["temp"]
-FEED_BMP_PRESS = config.mqtt[config.BROKER]["feeds"]["bmp"]["press"]
-FEED_DS18B20_TEMP = config.mqtt[config.BROKER]["feeds"]["ds18b20"]["temp"]
-FEED_STATUS = config.mqtt[config.BROKER]["feeds"]["status"] # feed for errors and status
-FEED_COMMAND = config.mqtt[config.BROKER]["feeds"]["command"] # Feed for subscription to recieve commands  
+_FEEDS = config.mqtt[config.BROKER]["feeds"] # looked up only once
+FEED_AHT_TEMP = _FEEDS["aht"]["temp"]
+FEED_AHT_HUM = _FEEDS["aht"]["hum"]
+FEED_OUT_TEMP = _FEEDS["out"]["temp"]
+FEED_OUT_FEELS_LIKE_TEMP = _FEEDS["out"]["feels_like_temp"]
+FEED_OUT_HUM = _FEEDS["out"]["hum"]
+FEED_OUT_PRESS = _FEEDS["out"]["press"]
+FEED_BMP_TEMP = _FEEDS["bmp"]["temp"]
+FEED_BMP_PRESS = _FEEDS["bmp"]["press"]
+FEED_DS18B20_TEMP = _FEEDS["ds18b20"]["temp"]
+# NOTE: the status and command feeds go to umqtt as they are, hence encoded to bytes only once here [rather than on each publish]
+FEED_STATUS = _FEEDS["status"].encode() # feed for errors and status
+FEED_COMMAND = _FEEDS["command"].encode() # Feed for subscription to recieve commands  
+SUBSCRIBE_FEEDS = (FEED_COMMAND,) # feeds subscribed to on (re)connect
 
 # outside weather api
 WEATHER_PROVIDER = config.weather_provider # 1 for openweathermap, 2 for tomorrow.io
-URL, HEADERS = (config.OWM_URL, config.OWM_HEADERS) if WEATHER_PROVIDER is 1 else (config.TOM_URL, config.TOM_HEADERS)
+URL, HEADERS = (config.OWM_URL, config.OWM_HEADERS) if WEATHER_PROVIDER == 1 else (config.TOM_URL, config.TOM_HEADERS)
+
+# split the weather api url only once into its parts
+WEATHER_TLS, WEATHER_HOST, WEATHER_PORT, WEATHER_PATH = split_url(URL)
+# the complete http request is composed only once as bytes (so no re-encoding is needed) and then sent as it is on each fetch
+WEATHER_REQUEST = build_get_request(WEATHER_HOST, WEATHER_PATH, HEADERS)
+
+# base url of the raw files in the github repo for OTA updates [built once rather than on every 'update' command]
+REPO_RAW_URL = f'http://raw.githubusercontent.com/{config.REPO_OWNER}/{config.REPO_NAME}/main/' # Note: we are using http request rather than https to reduce computation on esp32
+
+# pack the feed names once into one contiguous bytes blob, and return each feed as a zero copy memoryview slice of it
+# [one heap object for all the topics rather than one per feed; also umqtt gets the topics readily encoded as bytes]
+def pack_feeds(feeds):
+    blob = memoryview(b"".join([feed.encode() for feed in feeds]))
+    views = []
+    start = 0
+    for feed in feeds:
+        end = start + len(feed.encode())
+        views.append(blob[start:end])
+        start = end
+    return tuple(views)
+
+# publishing feeds: the publishing data is indexed by these small int ids
+PUBLISH_FEEDS = pack_feeds((FEED_AHT_TEMP, FEED_AHT_HUM, FEED_BMP_TEMP, FEED_BMP_PRESS, FEED_DS18B20_TEMP,
+                            FEED_OUT_TEMP, FEED_OUT_FEELS_LIKE_TEMP, FEED_OUT_HUM, FEED_OUT_PRESS))
+(ID_AHT_TEMP, ID_AHT_HUM, ID_BMP_TEMP, ID_BMP_PRESS, ID_DS18B20_TEMP,
+ ID_OUT_TEMP, ID_OUT_FEELS_LIKE_TEMP, ID_OUT_HUM, ID_OUT_PRESS) = range(len(PUBLISH_FEEDS))
+
+# publishing data: a list of [feed, value] pairs in the fixed order of PUBLISH_FEEDS; it is created only once and
+#                  only the values are overwritten in place each cycle, rather than building a fresh dict every INTERVAL
+#                  [less allocations => less heap fragmentation]
+publishing_data = [[feed, None] for feed in PUBLISH_FEEDS]
+# frame buffer into which the mqtt packets of the publishing data are composed, to be sent with a single socket write
+PUBLISH_FRAME = bytearray(512)
+
+# combined feed: with config.BATCH_MQTT, all the readings are published as a single json message to this one feed
+#                [one publish per cycle rather than one per feed; e.g. to stay within the adafruit io rate limit]
+BATCH_MQTT = config.BATCH_MQTT
+FEED_COMBINED = _FEEDS.get("combined")
+# json keys of the readings, in the fixed order of PUBLISH_FEEDS
+COMBINED_KEYS = (b'"aht_t":', b'"aht_h":', b'"bmp_t":', b'"bmp_p":', b'"ds18":',
+                 b'"out_t":', b'"out_fl":', b'"out_h":', b'"out_p":')
+combined_data = [[FEED_COMBINED.encode() if FEED_COMBINED else None, None]]
+# with BATCH_MQTT, this many samples are collected and then published together as a single json array
+# [one publish per BATCH_SAMPLES cycles; the age of the oldest sample is hence bounded by BATCH_SAMPLES * INTERVAL]
+BATCH_SAMPLES = config.BATCH_SAMPLES
+sample_batch = [] # json objects of the samples not published yet [kept across the failed publishes, up to 4 batches]
+UNIX_EPOCH_OFFSET = const(946684800) # sec [time() on esp32 counts from 2000-01-01, rather than from the unix epoch 1970-01-01]
+CLOCK_SET = False # whether the system rtc keeps the real time [set from the ds3231, or synced with ntp]; until then time() only counts from the boot
+MAX_PAYLOAD = const(1024) # bytes [adafruit io rejects a value longer than 1 KB; so a batch is published early once it gets this long]
+batch_count = 0 # number of the (oldest) samples in the combined data being published [they are dropped from sample_batch once it is published]
+
+# compose the publishing data into a single json object [the values are already formatted numbers as bytes,
+# so they are joined in as they are, rather than being converted back and forth by ujson]
+# returns the combined data to publish, or None while the batch of samples is not full yet
+def combine_data(data):
+    global batch_count
+    # a batched sample carries its own time, since it is published later: "t" is a unix timestamp (sec since 1970-01-01 UTC),
+    # or null while the system rtc is not set [the rtc keeps IST (see sync_time_with_ntp()), hence IST_OFFSET is taken off]
+    if BATCH_SAMPLES == 1:
+        parts = [b"{"]
+    elif CLOCK_SET:
+        parts = [b'{"t":%d,' % (time() + UNIX_EPOCH_OFFSET - IST_OFFSET)]
+    else:
+        parts = [b'{"t":null,']
+    for i in range(len(data)):
+        if i:
+            parts.append(b",")
+        parts.append(COMBINED_KEYS[i])
+        value = data[i][1]
+        parts.append(b"null" if value is None or value == b"None" else value)
+    parts.append(b"}")
+    if BATCH_SAMPLES == 1:
+        combined_data[0][1] = b"".join(parts)
+        return combined_data
+    
+    if len(sample_batch) >= 4 * BATCH_SAMPLES: # the publishing keeps failing; so drop the oldest sample
+        sample_batch.pop(0)
+    sample_batch.append(b"".join(parts))
+    size = 1 + sum(len(sample) + 1 for sample in sample_batch) # of the json array of all the samples
+    if len(sample_batch) < BATCH_SAMPLES and size <= MAX_PAYLOAD:
+        return None
+    # the oldest samples that fit within MAX_PAYLOAD [at least one]; the rest wait for the next publish
+    size = 1
+    batch_count = 0
+    for sample in sample_batch:
+        size += len(sample) + 1
+        if batch_count and size > MAX_PAYLOAD:
+            break
+        batch_count += 1
+    combined_data[0][1] = b"[" + b",".join(sample_batch[:batch_count]) + b"]"
+    return combined_data
 
 '''
 Introducing a state machine-
@@ -57,34 +155,53 @@ Introducing a state machine-
 1: DEGRADED: Running with limited functionality.
 2: MAINTENANCE: Enter maintenance mode due to persistent issues.
 '''
-SYSTEM_STATE = 0
+STATE_NORMAL = const(0)
+STATE_DEGRADED = const(1)
+STATE_MAINTENANCE = const(2)
+SYSTEM_STATE = STATE_NORMAL
+
+# compile time constants [const() values are inlined into the bytecode wherever they are used after this point, instead of a global lookup]
+WEATHER_FETCH_DELAY = const(600) # seconds [since openweathermap updates its real time weather data only each 10 minutes]
+WEATHER_FETCH_JITTER = const(30) # seconds [each fetch is scheduled randomly within +/- this much of WEATHER_FETCH_DELAY, so that fetches do not stay aligned to fixed times]
+WEATHER_RETRY_DELAY = const(30) # seconds [delay before retrying a failed weather fetch; doubled on each consecutive failure]
+WEATHER_RETRY_MAX_DELAY = const(300) # seconds [cap of the above]
+IST_OFFSET = const(19800) # sec [IST = UTC + 5:30]
+MQTT_POLL_TIMEOUT = const(5000) # ms [max wait for incoming mqtt data during the idle time of a cycle; the watchdog is fed at least this often]
+
+# hardware timers: a small fixed pool created once and handed out by index to the subsystems that need one
+#                  (rather than each subsystem instantiating its own) [timers are a scarce peripheral resource]
+TIMERS = (machine.Timer(0),)
+TIMER_LED = const(0)
 
     
 # sync rtc with ntp server (internet is needed for this)
-def sync_time_with_ntp(ntp_retry_timer, attempt = 0, max_attempts = 3,
+NTP_RETRY_DELAYS = (240, 480, 960) # sec [exponential backoff between the ntp sync attempts; precomputed rather than computed on each failure]
+
+def sync_time_with_ntp(retry_delays = NTP_RETRY_DELAYS,
                        logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
-    try:
-        settime() # set rtc to UTC [host = 'pool.ntp.org']
-        # mktime returns sec from epoch given date and time tuple
-        current_time_ist = localtime(mktime(localtime()) + 19800) # IST = UTC + 19800 (in sec)
-        # NOTE: tuple formats for time module (i.e. localtime() = (year, month, mday, hour, minute, second, weekday, yearday));
-        #       and RTC module (i.e. datetime() = (year, month, day, weekday, hours, minutes, seconds, subseconds)) are different 
-        current_time_ist = (current_time_ist[0], current_time_ist[1], current_time_ist[2],
-                          current_time_ist[6], current_time_ist[3], current_time_ist[4],
-                          current_time_ist[5], 0) # acc. to datetime tuple format
-        rtc = machine.RTC()
-        rtc.datetime(current_time_ist)
-        logger.info("RTC time synced with NTP")
-        ntp_retry_timer.deinit()
-        return
-    except Exception as e:
-        logger.error(f'Failed to sync time with NTP in attempt {attempt}: {e}, Retrying after some time...')
-        # retry using Timer - after setting the timer, current instance of the function returns
-        if attempt < max_attempts:
-            ntp_retry_timer.init(period=(2**attempt)*240 * 1000, mode=machine.Timer.ONE_SHOT, callback=lambda t: sync_time_with_ntp(ntp_retry_timer, attempt=attempt + 1, max_attempts=max_attempts, logger=logger))
-        else:
-            logger.error("Maximum number of retries reached. RTC syncing with NTP failed.")
-            ntp_retry_timer.deinit()
+    # NOTE: this is only needed once during setup, so a plain retry loop with exponential backoff is used
+    #       [earlier a one-shot machine.Timer re-scheduled this function from its callback for each retry]
+    from ntptime import settime # imported here, as it is needed only once [rather than occupying the heap since boot]
+    for attempt in range(len(retry_delays) + 1): # first attempt + a retry after each delay
+        try:
+            settime() # set rtc to UTC [host = 'pool.ntp.org']
+            # mktime returns sec from epoch given date and time tuple
+            # NOTE: tuple formats for time module (i.e. localtime() = (year, month, mday, hour, minute, second, weekday, yearday));
+            #       and RTC module (i.e. datetime() = (year, month, day, weekday, hours, minutes, seconds, subseconds)) are different 
+            year, month, mday, hour, minute, second, weekday, _ = localtime(mktime(localtime()) + IST_OFFSET) # IST = UTC + 19800 (in sec)
+            rtc = machine.RTC()
+            rtc.datetime((year, month, mday, weekday, hour, minute, second, 0)) # acc. to datetime tuple format
+            logger.info("RTC time synced with NTP")
+            return True
+        except Exception as e:
+            if attempt < len(retry_delays):
+                retry_delay = utils.backoff_delay(retry_delays[attempt], 0, config.BACKOFF_JITTER, retry_delays[attempt]) # sec [with a random jitter; the precomputed delays are not capped]
+                logger.error(f'Failed to sync time with NTP in attempt {attempt}: {e}, Retrying in {retry_delay:.0f} sec...')
+                utils.watchdog_sleep(retry_delay) # keep feeding the watchdog (if enabled) during the long wait
+            else:
+                logger.exception(f'Failed to sync time with NTP in attempt {attempt}', e)
+    logger.error("Maximum number of retries reached. RTC syncing with NTP failed.")
+    return False
 
 # heat index - calculates heat index given dry bulb temperature (in C) and relative humidity [source: wikipedia]
 # Note: 1. The formula below approximates the heat index within 0.7 °C (except the values at 32 °C & 45%/70% relative humidity vary unrounded by less than ±1, respectively).
@@ -98,61 +215,167 @@ Temperature    Notes
 41–54 °C       Danger: heat cramps and heat exhaustion are likely; heat stroke is probable with continued activity.
 over 54 °C     Extreme danger: heat stroke is imminent.
 '''
+# heat index thresholds (in C) of the levels in the table above
+HI_CAUTION = const(27)
+HI_EXTREME_CAUTION = const(32)
+HI_DANGER = const(41)
+HI_EXTREME_DANGER = const(54)
+
+@micropython.native
 def heat_index(temp, rh):
-    if temp<27 or rh<40:
+    if temp<HI_CAUTION or rh<40:
         return None
-    temp2 = temp**2
-    rh2 = rh**2
-    hi = -8.78469475556 + 1.61139411*temp + 2.33854883889*rh - 0.14611605*temp*rh -\
-         0.012308094*temp2 - 0.0164248277778*rh2 + 2.211732e-3*temp2*rh +\
-         7.2546e-4*temp*rh2 - 3.582e-6*temp2*rh2
-    if hi >= 54:
+    # the polynomial in horner form [i.e. a quadratic in temp, whose coefficients are quadratics in rh]
+    # -> only 6 multiplications and no '**' [same as the expanded form: -8.78469475556 + 1.61139411*T + 2.33854883889*R - 0.14611605*T*R -
+    #    0.012308094*T^2 - 0.0164248277778*R^2 + 2.211732e-3*T^2*R + 7.2546e-4*T*R^2 - 3.582e-6*T^2*R^2]
+    hi = (-8.78469475556 + rh*(2.33854883889 - 0.0164248277778*rh)) +\
+         temp*((1.61139411 + rh*(-0.14611605 + 7.2546e-4*rh)) +\
+               temp*(-0.012308094 + rh*(2.211732e-3 - 3.582e-6*rh)))
+    if hi >= HI_EXTREME_DANGER:
         level = 4
-    elif hi >= 41:
+    elif hi >= HI_DANGER:
         level = 3
-    elif hi >= 32:
+    elif hi >= HI_EXTREME_CAUTION:
         level = 2
-    elif hi >= 27:
+    elif hi >= HI_CAUTION:
         level = 1
     else:
         level = None
     return hi, level
     
-# fetch outside weather data using openweathermap api
-def fetch_weather_data(url, headers):
+# http session keeping a persistent (keep-alive) connection to the weather api server, and a preallocated buffer for its responses
+# [rather than opening a new socket and allocating a new response object (urequests) on each fetch]
+weather_session = Session(buffer_size=1024, timeout=config.WEATHER_HTTP_TIMEOUT_S) # weather api responses are well under 1 KB
+
+# the only json object of the weather response that we need [a flat object holding all 4 readings]
+# and the keys of the readings in it [in the order: temperature, feels like temperature, humidity, pressure]
+if WEATHER_PROVIDER == 1: # openweathermap ["main" object]
+    WEATHER_OBJECT_KEY = b'"main":{'
+    WEATHER_KEYS = (b'"temp":', b'"feels_like":', b'"humidity":', b'"grnd_level":') # pressure in hPa [ground level]
+else: # tomorrow.io ["data" > "values" object]
+    WEATHER_OBJECT_KEY = b'"values":{'
+    WEATHER_KEYS = (b'"temperature":', b'"temperatureApparent":', b'"humidity":', b'"pressureSurfaceLevel":') # pressure in hPa [at surface level not sea level]
+
+# find a bytes pattern in a buffer (bytearray/memoryview do not support find() in micropython)
+# returns the index of the first match in buf[start:end] or -1
+@micropython.native
+def find_in_buffer(buf, pattern, start, end):
+    n = len(pattern)
+    first = pattern[0]
+    i = start
+    while i <= end - n:
+        if buf[i] == first:
+            k = 1
+            while k < n and buf[i + k] == pattern[k]:
+                k += 1
+            if k == n:
+                return i
+        i += 1
+    return -1
+
+# extract the number of the given json key (incl. its quotes and colon) in buf[start:end], or None if the key is not there
+# [the number is converted straight from its bytes, so no json parsing and no dict/str allocations are involved]
+@micropython.native
+def extract_number(buf, key, start, end):
+    i = find_in_buffer(buf, key, start, end)
+    if i < 0:
+        return None
+    i += len(key)
+    j = find_in_buffer(buf, b',', i, end)
+    if j < 0: # last key of the object
+        j = end
+    return float(buf[i:j])
+
+# fetch outside weather data using openweathermap api, into the given list 'out' in the format:
+# [temperature, feels_like_temp, humidity, pressure] [filled in place, rather than allocating a new list on each fetch]
+# NOTE: compiled to native machine code rather than bytecode, for speed
+@micropython.native
+def fetch_weather_data(out):
     try:
         #utils.log_memory(logger) # DEBUG
-        response = urequests.get(url, headers=headers, timeout=15) # wait for 10 sec for a response from the server else it will raise OSError; [otherwise without timeout, the program may hang here for a very long indefinite time in case server does not respond due to unreliable network, etc]
-        weather_data = response.json()
-        response.close()
+        # NOTE: body is a memoryview into the session's buffer
+        status_code, body = weather_session.request(WEATHER_HOST, WEATHER_PORT, WEATHER_REQUEST, tls=WEATHER_TLS)
+        # scan only the needed object of the response for the 4 readings, rather than parsing the whole response into dicts
+        temperature = feels_like_temp = humidity = pressure = None
+        if status_code == 200:
+            start = find_in_buffer(body, WEATHER_OBJECT_KEY, 0, len(body))
+            if start >= 0:
+                start += len(WEATHER_OBJECT_KEY)
+                end = find_in_buffer(body, b'}', start, len(body)) # the object is flat, so its first '}' closes it
+                if end >= 0:
+                    temperature = extract_number(body, WEATHER_KEYS[0], start, end)
+                    feels_like_temp = extract_number(body, WEATHER_KEYS[1], start, end)
+                    humidity = extract_number(body, WEATHER_KEYS[2], start, end) # % RH
+                    pressure = extract_number(body, WEATHER_KEYS[3], start, end)
+                    if pressure is not None:
+                        pressure *= 100  # Convert hPa to Pa
         #utils.log_memory(logger)
         
-        if WEATHER_PROVIDER==1:
-            # openweathermap
-            if (response.status_code == 200 and 'main' in weather_data):
-                temperature = weather_data['main']['temp']
-                feels_like_temp = weather_data['main']['feels_like']
-                humidity = weather_data['main']['humidity']
-                pressure = weather_data['main']['grnd_level'] * 100  # Convert hPa to Pa [ground level pressure]
-            else:
-                temperature = feels_like_temp = humidity = pressure = None
-        elif WEATHER_PROVIDER==2:
-            # tomorrow.io
-            if (response.status_code == 200 and 'data' in weather_data):
-                temperature = weather_data['data']['values']['temperature']
-                feels_like_temp = weather_data['data']['values']['temperatureApparent'] # feels like temp
-                humidity = weather_data['data']['values']['humidity'] # % RH
-                pressure = weather_data['data']['values']['pressureSurfaceLevel'] * 100 # Pa [at surface level not sea level]
-            else:
-                temperature = feels_like_temp = humidity = pressure = None
-                
-        return [temperature, feels_like_temp, humidity, pressure]
+        # update only once the whole response has been scanned [so that an error midway leaves the previous data intact]
+        out[0] = temperature
+        out[1] = feels_like_temp
+        out[2] = humidity
+        out[3] = pressure
     except OSError as e:
         raise OSError(f"HTTP request failed or timed out while fetching weather data: {e}")
     except Exception as e:
         raise Exception (f"Error fetching weather data: {e}")
 
-# helper function - format sensor and other readings to .2f string, for consistent formatting and publication to mqtt feed
+# persist the cached weather data along with its fetch time (epoch sec) to flash, so that a reset
+# (which is frequent due to 'update'/'reboot' commands etc) does not waste an api call within WEATHER_FETCH_DELAY
+WEATHER_CACHE_FILE = '/weather.cache'
+
+def save_weather_cache(weather_data, timestamp,
+                       logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
+    try:
+        # None can not be packed as a float, hence it is stored as nan
+        values = [float('nan') if value is None else value for value in weather_data]
+        with open(WEATHER_CACHE_FILE, 'wb') as f:
+            f.write(ustruct.pack('ffffI', values[0], values[1], values[2], values[3], timestamp))
+    except Exception as e:
+        logger.exception("Failed to save the weather cache", e)
+
+def load_weather_cache(logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
+    '''returns (weather_data, timestamp) from the saved cache, or None if there is no valid cache'''
+    try:
+        with open(WEATHER_CACHE_FILE, 'rb') as f:
+            values = ustruct.unpack('ffffI', f.read())
+        return [None if value != value else value for value in values[:4]], values[4] # nan != nan
+    except OSError: # no cache saved yet
+        return None
+    except Exception as e:
+        logger.exception("Failed to load the weather cache", e)
+        return None
+
+# deep sleep mode: the device reboots on each wake, so the count of wakes and the batched samples not published yet are
+# saved to flash right before sleeping [the rtc memory is already taken by the broker's ip cache, see mqtt_functions]
+SLEEP_STATE_FILE = '/sleep.state'
+
+def save_sleep_state(wakes,
+                     logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
+    try:
+        with open(SLEEP_STATE_FILE, 'wb') as f:
+            f.write(b"\n".join([str(wakes).encode()] + sample_batch)) # one sample (a json object) per line
+    except Exception as e:
+        logger.exception("Failed to save the sleep state", e)
+
+def load_sleep_state(logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
+    '''restores the batched samples (in place) and returns the count of wakes saved before the sleep [0 if there is none]'''
+    try:
+        with open(SLEEP_STATE_FILE, 'rb') as f:
+            lines = f.read().split(b"\n")
+        sample_batch[:] = lines[1:]
+        return int(lines[0])
+    except OSError: # not saved yet
+        return 0
+    except Exception as e:
+        logger.exception("Failed to load the sleep state", e)
+        return 0
+
+# helper function - format sensor and other readings to .2f bytes, for consistent formatting and publication to mqtt feed
+# [formatted straight to bytes, which is what goes over the socket, rather than to a str that has to be encoded again]
+# NOTE: runs for each reading every cycle, hence compiled to native machine code rather than bytecode
+@micropython.native
 def format_value(value, precision=2):
     """
     Formats the sensor and other reading:
@@ -160,52 +383,59 @@ def format_value(value, precision=2):
     - Formats floats to the specified number of decimal places.
     """
     if value is None:
-        return str(value)
-    elif isinstance(value, int):
-        return str(value)  # Keep integers as is
-    elif isinstance(value, float):
-        return f"{value:.{precision}f}"  # Format floats
+        return b"None"
+    t = type(value) # identity checks of the exact type are cheaper than isinstance() [which also walks the subclasses]
+    if t is float: # the most common case first
+        return b"%.*f" % (precision, value)  # Format floats
+    elif t is int:
+        return b"%d" % value  # Keep integers as is
     else:
-        raise TypeError(f"Unsupported data type: {type(value)}")
+        raise TypeError(f"Unsupported data type: {t}")
     
 # function to gather and oragnize publishing data
+# NOTE: runs every cycle, hence compiled to native machine code rather than bytecode
+@micropython.native
 def gather_and_organize_data(sensors,
                              logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
-    global weather_fetch_counter
-    global last_weather_data
+    global next_weather_fetch
+    global weather_retry_delay
     
-    data = {}
+    data = publishing_data # reuse the same pairs; just update their values
     try:
         # fetch new outside weather data and update the cached weather data, if fetching has been successful, else just publish the old cached weather data
-        if weather_fetch_counter + INTERVAL >= WEATHER_FETCH_DELAY:
+        # NOTE: the schedule is kept by the monotonic ms ticks rather than by counting loop iterations,
+        #       since a slow cycle (reconnects, retries etc) would make the count drift away from the real elapsed time
+        if ticks_diff(ticks_ms(), next_weather_fetch) >= 0:
             try:
-                last_weather_data = fetch_weather_data(URL, HEADERS) # update the cached weather data
-                weather_fetch_counter -= WEATHER_FETCH_DELAY # also update weather_fetch_counter, if fetch_weather_data() is executed successfully, else not
+                fetch_weather_data(last_weather_data) # update the cached weather data (in place)
+                utils.feed_watchdog() # the fetch may have taken a good part of the watchdog timeout
+                # next fetch when this data gets old [WEATHER_FETCH_DELAY with a random jitter]
+                next_weather_fetch = ticks_add(ticks_ms(), (WEATHER_FETCH_DELAY + randint(-WEATHER_FETCH_JITTER, WEATHER_FETCH_JITTER)) * 1000)
+                weather_retry_delay = WEATHER_RETRY_DELAY
+                save_weather_cache(last_weather_data, time(), logger=logger)
                 # last_weather_data is a list in the format: [temperature_out, feels_like_temp_out, humidity_out, pressure_out]
             except Exception as e: # catch errors
-                logger.error(f"{e}", publish=True)
-        else:
-            # keeping this line here inside 'else' block [rather than at the start i.e. before the 'if' statement and then changing the 'if' conditon to weather_fetch_counter >= WEATHER_FETCH_DELAY]
-            # ensures that if there is a persistent exception in trying to fetch weather data; then still weather_fetch_counter does not keep increasing indefinitely
-            # [because anything that has happened inside the 'try' block before the exception occurs, does not reverses like changing the value of a variable etc]
-            weather_fetch_counter += INTERVAL
+                # retry with exponential backoff [rather than hitting a failing api in every cycle]
+                next_weather_fetch = ticks_add(ticks_ms(), weather_retry_delay * 1000)
+                weather_retry_delay = min(weather_retry_delay * 2, WEATHER_RETRY_MAX_DELAY)
+                logger.exception("Failed to fetch weather data", e, publish=True)
         
         sensor_readings = sensors.read_measurements()
         
-        data[FEED_AHT_TEMP] = format_value(sensor_readings['aht25'][0])
-        data[FEED_AHT_HUM] = format_value(sensor_readings['aht25'][1])
-        data[FEED_BMP_TEMP] = format_value(sensor_readings['bmp280'][0])
-        data[FEED_BMP_PRESS] = format_value(sensor_readings['bmp280'][1])
-        data[FEED_DS18B20_TEMP] = format_value(sensor_readings['ds18b20'])
-        data[FEED_OUT_TEMP] = format_value(last_weather_data[0])
-        data[FEED_OUT_FEELS_LIKE_TEMP] = format_value(last_weather_data[1])
-        data[FEED_OUT_HUM] = format_value(last_weather_data[2])
-        data[FEED_OUT_PRESS] = format_value(last_weather_data[3])      
-        return data
+        data[ID_AHT_TEMP][1] = format_value(sensor_readings['aht25'][0])
+        data[ID_AHT_HUM][1] = format_value(sensor_readings['aht25'][1])
+        data[ID_BMP_TEMP][1] = format_value(sensor_readings['bmp280'][0])
+        data[ID_BMP_PRESS][1] = format_value(sensor_readings['bmp280'][1])
+        data[ID_DS18B20_TEMP][1] = format_value(sensor_readings['ds18b20'])
+        data[ID_OUT_TEMP][1] = format_value(last_weather_data[0])
+        data[ID_OUT_FEELS_LIKE_TEMP][1] = format_value(last_weather_data[1])
+        data[ID_OUT_HUM][1] = format_value(last_weather_data[2])
+        data[ID_OUT_PRESS][1] = format_value(last_weather_data[3])      
+        return combine_data(data) if BATCH_MQTT else data
     
     except Exception as e:
-        logger.error(f"Failed to gather and organize data: {e}", publish=True)
-        return data
+        logger.exception("Failed to gather and organize data", e, publish=True)
+        return None # [the shared pairs may still hold the values of the previous cycle; so nothing is published this cycle]
     
 
 # callback handler: we are creating a callback handler class so that we can
@@ -214,11 +444,17 @@ def gather_and_organize_data(sensors,
 #                    Other option would be to use global variables but we are
 #                    not using a lot of global variables in our code.
 class CallbackHandler:
+    RING_SIZE = 4 # max number of received messages waiting to be executed
+    
     def __init__(self, led, ds,
                  logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
         self.led = led
         self.ds = ds
         self.logger = logger
+        # fixed size ring of the received messages [preallocated, so queueing a message allocates nothing]
+        self.ring = [None] * CallbackHandler.RING_SIZE
+        self.ring_read = 0 # index of the next message to execute
+        self.ring_write = 0 # index of the next free slot
         
     # callback function for subscription feed
     def feed_callback(self, feed, msg):
@@ -226,147 +462,206 @@ class CallbackHandler:
         '''
             feed: the subscribed feed or topic
             msg: the received message
+            
+            NOTE: it only queues the raw message in the ring; the message is executed later by process_messages() from the main loop,
+                  so no decoding, string handling or logging happens inside the mqtt client's callback
         '''
-        global INTERVAL
+        write = (self.ring_write + 1) % CallbackHandler.RING_SIZE
+        if write == self.ring_read: # ring full: drop the new message [the earlier ones are kept in order]
+            return
+        self.ring[self.ring_write] = msg
+        self.ring_write = write
+    
+    # execute all the queued messages in the order they were received
+    def process_messages(self):
+        while self.ring_read != self.ring_write:
+            msg = self.ring[self.ring_read]
+            self.ring[self.ring_read] = None # release the message
+            self.ring_read = (self.ring_read + 1) % CallbackHandler.RING_SIZE
+            self.execute_message(msg)
+    
+    # execute a received message
+    @micropython.native # runs on every received message, hence compiled to native machine code rather than bytecode
+    def execute_message(self, msg):
         try:
-            feed = feed.decode('utf-8')
-            msg = msg.decode('utf-8')
-            self.logger.info(f"Received message on {feed}: {msg}", publish=True)
+            # split the message only once into the instruction and its arguments [e.g. "update-main.py-<checksum>"]
+            # NOTE: partition() does not split the arguments any further, so they are split only by the instructions that need it
+            instruction, _, args = msg.partition(b"-")
             
-            # split the message into separate parts if present
-            msg = msg.split("-")
-            msg = [part.strip() for part in msg]
-            instruction = msg[0].lower() # the first part of the message will be instruction
+            # a single dict lookup finds the handler of the instruction [rather than comparing against each instruction in turn]
+            handler = CallbackHandler.COMMANDS.get(instruction.strip().lower()) # the first part of the message will be instruction
             
-            if instruction == "reboot":
-                self.logger.info("Reboot command received. Rebooting now...", publish=True)
-                sleep(1)  # Short delay before rebooting
-                machine.reset()
-            
-            elif instruction == "update":
-                self.logger.info("Update command received. Updating now...", publish=True)
-                sleep(1)  # Short delay before updating
-                if self.led: self.led.start_flashing()
-                
-                filename = msg[1]
-                
-                if len(msg) == 3: checksum = msg[2]
-                else: checksum = None
-                
-                link = f'http://raw.githubusercontent.com/{config.REPO_OWNER}/{config.REPO_NAME}/main/{filename}' # Note: we are using http request rather than https to reduce computation on esp32
-                if dwnld_and_update(link, filename, checksum=checksum, logger=self.logger): # if successful, then reboot to apply update
-                    self.logger.info("Resetting to apply the updates.", publish=True)
-                    if self.led: self.led.stop_flashing()
-                    sleep(1) # Short delay before rebooting
-                    machine.reset()
-                else:
-                    """maybe apply some retry logic"""
-                    if self.led: self.led.stop_flashing()
-                    return
-                
-            elif instruction == "toggleled":
-                if self.led:
-                    self.led.toggle()
-                    self.logger.info("LED toggled.", publish=True)
-                else:
-                    self.logger.warning("No LED found.", publish=True)
-                return
-                
-            elif instruction == "changeinterval": # change weather update interval for this session "changeinterval-60"
-                INTERVAL = int(msg[1])
-                self.logger.info(f"Changed the update interval for this session to {msg[1]} sec.", publish=True)
+            # fast path: ignore unrecognized messages right away [no decoding, and not even a (debug) log entry to format]
+            if handler is None:
                 return
             
-            elif instruction == "syncds3231": # sync ds3231 with ntp server
-                if self.ds:
-                    self.ds.sync_time_with_ntp()
-                    self.logger.info(f"Synced DS3231 time with NTP server.", publish=True)
-                else:
-                    self.logger.warning(f"DS3231 not available.", publish=True)
-                return
-            
-            elif instruction == "config": # change parameter values of one or multiple parameters in config.py
-                # Note: parameters and their new values are supposed to be in string representation of a Python dictionary
-                new_parameters = CallbackHandler.python_dict_str_to_json_to_python_dict(msg[1])
-    
-                if CallbackHandler.replace_lines_in_file('modules/config.py', new_parameters):
-                    self.logger.info(f"Replaced '{new_parameters}' in config.py.", publish=True)
-                    sleep(1) # Short delay before rebooting
-                    machine.reset() # reboot to apply changes
-                else:
-                    self.logger.info(f"No matching line found for '{new_parameters}'.", publish=True)
-                
-            elif instruction == "logs":
-                '''send logs'''
-                pass
-            
-            elif instruction == "maintenance":
-                '''enter maintenance mode'''
-                pass
+            self.logger.info(f"Received message: {msg.decode('utf-8')}", publish=True)
+            handler(self, args.decode('utf-8').strip())
             
         except Exception as e:
-            self.logger.error(f"Failed to execute the received message: {e}", publish=True)
+            self.logger.exception("Failed to execute the received message", e, publish=True)
+    
+    # command handlers: each one gets the (decoded and stripped) arguments part of the message
+    def reboot(self, args):
+        self.logger.info("Reboot command received. Rebooting now...", publish=True)
+        self.logger.flush(disconnect=True) # let the log messages out before rebooting
+        machine.reset()
+    
+    def update(self, args): # "update-<filename>" or "update-<filename>-<checksum>"
+        self.logger.info("Update command received. Updating now...", publish=True)
+        self.logger.publish_pending() # let the log message out before the (long) download
+        if self.led: self.led.start_flashing()
+        
+        filename, _, checksum = args.partition("-")
+        filename = filename.strip()
+        checksum = checksum.strip() or None
+        
+        # imported only when an update is actually requested [it also pulls in urequests]
+        from download_file import dwnld_and_update
+        link = REPO_RAW_URL + filename
+        if dwnld_and_update(link, filename, checksum=checksum, logger=self.logger): # if successful, then reboot to apply update
+            self.logger.info("Resetting to apply the updates.", publish=True)
+            if self.led: self.led.stop_flashing()
+            self.logger.flush(disconnect=True) # let the log messages out before rebooting
+            machine.reset()
+        else:
+            """maybe apply some retry logic"""
+            if self.led: self.led.stop_flashing()
+    
+    def toggle_led(self, args):
+        if self.led:
+            self.led.toggle()
+            self.logger.info("LED toggled.", publish=True)
+        else:
+            self.logger.warning("No LED found.", publish=True)
+    
+    def change_interval(self, args): # change weather update interval for this session "changeinterval-60"
+        global INTERVAL
+        INTERVAL = int(args)
+        self.logger.info(f"Changed the update interval for this session to {args} sec.", publish=True)
+    
+    def sync_ds3231(self, args): # sync ds3231 with ntp server
+        if self.ds:
+            self.ds.sync_time_with_ntp()
+            self.logger.info(f"Synced DS3231 time with NTP server.", publish=True)
+        else:
+            self.logger.warning(f"DS3231 not available.", publish=True)
+    
+    def change_config(self, args): # change parameter values of one or multiple parameters in config.py
+        # Note: parameters and their new values are supposed to be in string representation of a Python dictionary
+        new_parameters = CallbackHandler.python_dict_str_to_json_to_python_dict(args)
+
+        if CallbackHandler.replace_lines_in_file('modules/config.py', new_parameters):
+            self.logger.info(f"Replaced '{new_parameters}' in config.py.", publish=True)
+            self.logger.flush(disconnect=True) # let the log messages out before rebooting
+            machine.reset() # reboot to apply changes
+        else:
+            self.logger.info(f"No matching line found for '{new_parameters}'.", publish=True)
+    
+    def send_logs(self, args):
+        '''send logs'''
+        pass
+    
+    def maintenance(self, args):
+        '''enter maintenance mode'''
+        pass
+    
+    # dispatch table: instruction [as raw bytes, so that unrecognized messages can be dropped before any decoding] => its handler
+    COMMANDS = {
+        b"reboot": reboot,
+        b"update": update,
+        b"toggleled": toggle_led,
+        b"changeinterval": change_interval,
+        b"syncds3231": sync_ds3231,
+        b"config": change_config,
+        b"logs": send_logs,
+        b"maintenance": maintenance,
+    }
     
     @staticmethod
     def replace_lines_in_file(file_path, new_lines):
         """
-        Replace a specific line in a file efficiently for large files.
+        Replace the lines of the given parameters in a file.
 
         Parameters:
         - file_path: Path to the file to modify.
-        - new_lines: Lines to be replaced.
+        - new_lines: dict of parameter => its new value.
         """
-        modified = False  # Track if any changes are made
-        
-        # Open the original file for reading and a new file for writing
-        temp_file_path = file_path + '.tmp'
+        with open(file_path, 'r') as file:
+            lines = file.read().split('\n')
 
-        with open(file_path, 'r') as file, open(temp_file_path, 'w') as temp_file:
-            for line in file:
-                parameter = line.split('=')[0].strip()
-                if parameter in new_lines:
-                    if '#' in line:
-                        comment = line.split('#', 1)[-1]
-                        temp_file.write(f'{parameter} = {new_lines[parameter]} #{comment}\n')
-                    else:
-                        temp_file.write(f'{parameter} = {new_lines[parameter]}\n')
-                    modified = True
+        # replace the lines in memory, and then write the whole file only once [rather than line by line]
+        modified = False  # Track if any changes are made
+        for i, line in enumerate(lines):
+            parameter = line.partition('=')[0].strip()
+            if parameter in new_lines:
+                comment = line.partition('#')[2]
+                if comment:
+                    lines[i] = f'{parameter} = {new_lines[parameter]} #{comment}'
                 else:
-                    temp_file.write(line)
-
-        # Replace the original file with the temporary file
-        if modified:
-            import os
-            os.remove(file_path)
-            os.rename(temp_file_path, file_path)
-            return True
-        else:
-            # Clean up the temporary file if no changes were made
-            os.remove(temp_file_path)
+                    lines[i] = f'{parameter} = {new_lines[parameter]}'
+                modified = True
+        if not modified:
             return False
+
+        # write to a temporary file first and then replace the original file with it,
+        # so that a reset midway through the write can not leave a truncated file
+        temp_file_path = file_path + '.tmp'
+        with open(temp_file_path, 'w') as temp_file:
+            temp_file.write('\n'.join(lines))
+        os.rename(temp_file_path, file_path) # replaces the old file atomically [littlefs]; so a reset can not leave us without a config file
+        return True
+    
+    # python literals and their JSON equivalents
+    JSON_LITERALS = {"True": "true", "False": "false", "None": "null"}
     
     @staticmethod
     # convert a string representation of a Python dictionary to a Python dictionary by first converting it to a JSON
     def python_dict_str_to_json_to_python_dict(python_dict_str):
         import json
-        import re
-        # Use regex to replace True, False, and None with JSON equivalents
-        python_dict_str = re.sub(r'\bTrue\b', 'true', python_dict_str)
-        python_dict_str = re.sub(r'\bFalse\b', 'false', python_dict_str)
-        python_dict_str = re.sub(r'\bNone\b', 'null', python_dict_str)
+        # replace True, False, and None with JSON equivalents in a single pass over the string [rather than importing the
+        # heavy re module and rebuilding the string once per literal]; only whole words outside of the quoted strings are replaced
+        s = python_dict_str
+        n = len(s)
+        parts = []
+        start = 0 # start of the part of s not copied to parts yet
+        i = 0
+        while i < n:
+            c = s[i]
+            if c == '"' or c == "'": # skip the quoted string
+                i += 1
+                while i < n and s[i] != c:
+                    i += 2 if s[i] == '\\' else 1
+                i += 1
+            elif c.isalpha() or c == '_': # a word
+                j = i + 1
+                while j < n and (s[j].isalpha() or s[j].isdigit() or s[j] == '_'):
+                    j += 1
+                literal = CallbackHandler.JSON_LITERALS.get(s[i:j])
+                if literal:
+                    parts.append(s[start:i])
+                    parts.append(literal)
+                    start = j
+                i = j
+            else:
+                i += 1
+        parts.append(s[start:])
         # now convert JSON to python dict
-        return json.loads(python_dict_str)
+        return json.loads(''.join(parts))
     
 def setup_with_retry(function, *args,
                      max_retries=config.MAX_RETRIES,
                      backoff_base=config.BACKOFF_BASE,
+                     jitter=config.BACKOFF_JITTER,
+                     max_delay=config.BACKOFF_MAX_DELAY,
                      light_sleep_duration=config.LONG_SLEEP_DURATION,
                      led=None,
                      logger: Logger = None, # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
                      **kwargs): # *args, **kwargs are the arguments, ketword arguments of the function
     '''this functions handles any given setup function with retries'''
     try:
-        result = utils.retry_with_backoff(function, *args, max_retries=max_retries, backoff_base=backoff_base, logger=logger, **kwargs)
+        result = utils.retry_with_backoff(function, *args, max_retries=max_retries, backoff_base=backoff_base,
+                                          jitter=jitter, max_delay=max_delay, logger=logger, **kwargs)
         if result:
             return result # setup of given function successful
         else: # take critical action if all retries failed for the function i.e. None is returned by retry_with_backoff function
@@ -408,14 +703,31 @@ def setup_with_retry(function, *args,
         raise SetupError("Setup Function Failed")
 
 
+# reconnect to mqtt server and re-subscribe to feeds, if wifi is connected
+HALF_LONG_SLEEP = config.LONG_SLEEP_DURATION // 2 # ms [light sleep after the reconnects failed; computed once rather than on each reconnect]
+
+def reconnect_mqtt(client, wifi, led=None,
+                   logger: Logger = None): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of None]
+    '''returns True if (re)connection was attempted successfully, else False if wifi is not connected'''
+    if not wifi.isconnected():
+        return False
+    setup_with_retry(mqtt_functions.connect_and_subscribe, client, SUBSCRIBE_FEEDS,
+                     clean_session=config.MQTT_CLEAN_SESSION,
+                     max_retries = config.MAX_RETRIES, backoff_base = config.BACKOFF_BASE,
+                     light_sleep_duration=HALF_LONG_SLEEP,
+                     led=led,
+                     logger=logger)
+    return True
+
     
 #################################################################################################
 #+++++++++++++++++++++++++++++ MAIN +++++++++++++++++++++++++++#
-WEATHER_FETCH_DELAY = 600 # seconds [since openweathermap updates its real time weather data only each 10 minutes]
-weather_fetch_counter = WEATHER_FETCH_DELAY # this counter will ensure that we only fetch real time weather from api each WEATHER_FETCH_DELAY
-last_weather_data = [None, None, None, None] # cache the last weather data
+next_weather_fetch = ticks_ms() # deadline (ticks_ms) of the next weather fetch [i.e. due right away]; ensures that we only fetch real time weather from api each WEATHER_FETCH_DELAY
+weather_retry_delay = WEATHER_RETRY_DELAY # seconds [current backoff delay for retrying a failed weather fetch]
+last_weather_data = [None, None, None, None] # cache the last weather data [allocated only once; updated in place]
 
 INTERVAL = config.UPDATE_INTERVAL # frequency of weather update (in ms)
+DEEP_SLEEP_MODE = config.DEEP_SLEEP_MODE
 # Main function
 def main():    
     print("Restarted!!!")
@@ -429,6 +741,22 @@ def main():
     
     cause = utils.reset_cause(logger=logger) # reset cause
     
+    # deep sleep mode: count the wakes and restore the samples batched before the sleep [after any other reset, start afresh]
+    wakes = 0
+    if DEEP_SLEEP_MODE and machine.reset_cause() == machine.DEEPSLEEP_RESET:
+        wakes = load_sleep_state(logger=logger) + 1
+    
+    # restore the weather data cached before the reset, if it is still fresh
+    global next_weather_fetch
+    global CLOCK_SET
+    cache = load_weather_cache(logger=logger)
+    if cache:
+        elapsed = time() - cache[1]
+        if 0 <= elapsed < WEATHER_FETCH_DELAY:
+            last_weather_data[:] = cache[0] # in place
+            next_weather_fetch = ticks_add(ticks_ms(), (WEATHER_FETCH_DELAY - elapsed) * 1000) # so the next fetch happens only when the cached data becomes WEATHER_FETCH_DELAY old
+            logger.info(f"Restored the weather data cached {elapsed} sec ago.")
+    
     #=====================================================================================
     #++++++++++++++++++++++++ SET-UP ++++++++++++++++++++#
     # SET-UP
@@ -441,19 +769,30 @@ def main():
         
         if ds:
             logger.ds3231rtc = ds # use ds3231rtc to take logger's timestamps
+            # set the system rtc from the ds3231 [ntp is not synced when the ds3231 is there; so otherwise time() only counts from the boot]
+            t = ds.get_time() # (year, month, day, hour, minute, second, weekday, 0)
+            if t:
+                machine.RTC().datetime((t[0], t[1], t[2], t[6], t[3], t[4], t[5], 0)) # acc. to datetime tuple format
+                CLOCK_SET = True
+            # the alarm woke the device from the deep sleep [its falling edge came before the irq was attached; so it is handled
+            # below, once the logger can publish (the alarm's action is a publish)]
+            alarm_woke = wakes and machine.wake_reason() == machine.EXT0_WAKE
             ''' take care of the case when there is no mqtt connection and alarm fires;
                 and alarm handler requires mqtt connectivity. although for now
                 it will produce an error which will be handled without breaking
                 the main loop (i think); but handle it such that it doesn't even
                 produce an error.'''
-            ds.set_alarm(1, hr=08, min=00, sec=00)
+            if alarm_woke: # still set from before the sleep [setting it again would clear its flag before the handler below sees it]
+                ds.alarm1 = True
+            else:
+                ds.set_alarm(1, hr=8, min=0, sec=0)
             #ds.set_alarm(2, week= 5, day=01, hr=00, min=00, sec=00)
         
         # initialize led
         led = None
         if config.LED_PIN:
             try:
-                led = LED(config.LED_PIN, logger=logger)
+                led = LED(config.LED_PIN, timer=TIMERS[TIMER_LED], logger=logger)
             except:
                 led = None
             
@@ -465,10 +804,11 @@ def main():
                                 led=led,
                                 logger=logger)
         
-        if not ds: # fallback mechanism for ds3231 i.e. if ds3231 is not present or not initialized then use system rtc
+        if not ds and not wakes: # fallback mechanism for ds3231 i.e. if ds3231 is not present or not initialized then use system rtc
             # sync rtc time with NTP server
-            ntp_retry_timer = machine.Timer(-1)
-            sync_time_with_ntp(ntp_retry_timer, logger=logger) # we only need to do this once, until device remains powered
+            CLOCK_SET = sync_time_with_ntp(logger=logger) # we only need to do this once, until device remains powered [the system rtc keeps running in deep sleep]
+        elif not ds: # woke from the deep sleep: the system rtc kept running, and it is set if it was synced before [otherwise it counts from 2000-01-01]
+            CLOCK_SET = localtime()[0] > 2000
         
         # create a callback handler instance
         feed_handler = CallbackHandler(led, ds, logger=logger)
@@ -494,13 +834,12 @@ def main():
         logger.mqtt_client = client
         logger.mqtt_feed = FEED_STATUS
         
+        if ds and alarm_woke:
+            ds.alarm_handler(ds.alarm_pin) # [queues its publish; it goes out once connected below]
+        
         # Connect to MQTT broker and suscribe to given feeds
-        if client and wifi.isconnected():
-            setup_with_retry(mqtt_functions.connect_and_subscribe, client, [FEED_COMMAND],
-                            max_retries = config.MAX_RETRIES, backoff_base = config.BACKOFF_BASE,
-                            light_sleep_duration=config.LONG_SLEEP_DURATION//2,
-                            led=led,
-                            logger=logger)
+        if client:
+            reconnect_mqtt(client, wifi, led=led, logger=logger)
                 
         # initialize the sensors with retry mechanism
         sensors = setup_with_retry(Sensors,
@@ -512,7 +851,7 @@ def main():
                                     i2cPins=(config.sclPIN, config.sdaPIN),
                                     onewirePin=config.ONEWIRE_PIN)
         if sensors.recovery_needed:
-            #SYSTEM_STATE = 1 # "DEGRADED"
+            #SYSTEM_STATE = STATE_DEGRADED
             logger.warning("Some sensors are not active or failed to initialize. System in Degraded Mode.",publish=True)
     
     
@@ -521,113 +860,194 @@ def main():
                             Add some failsafe for this, such as running only with available resources if possible or just go into some maintenance mode.'''
     except SetupError as se:
         logger.critical(f"Setup error occurred: {se}. Resetting the Device...")
-        sleep(10) # take a little break before resetting, to let actions like logging complete
-        machine.reset()
+        logger.flush() # let actions like logging complete before resetting
+        # only restart the interpreter [the wifi driver keeps its state, so the next setup reassociates faster]
+        # NOTE: this is fine only here, before the watchdog is enabled; it keeps running across a soft reset, and would
+        #       then reset the device midway through the next (unfed) setup [hence the loop below resets the hard way]
+        machine.soft_reset()
     except Exception as e:
         logger.critical(f"Unhandled exception during setup: {e}. Resetting the Device...")
-        sleep(10) # take a little break before resetting, to let actions like logging complete
+        logger.flush() # let actions like logging complete before resetting
         machine.reset()
     #=====================================================================================
     
     
-    # log some one time info to Adafruit IO server, once connected
-    try:
-        mqtt_functions.publish_data(client, {FEED_STATUS: f"INFO - Reset cause: {cause}"}, logger=logger)
-    except Exception as e:
-        logger.error(f"Error publishing to Adafruit IO.")
+    # log some one time info to Adafruit IO server, once connected [not on each wake from the deep sleep]
+    if not wakes:
+        try:
+            mqtt_functions.publish_data(client, {FEED_STATUS: f"INFO - Reset cause: {cause}"}, logger=logger)
+        except Exception as e:
+            logger.error(f"Error publishing to Adafruit IO.")
     
     
     #=====================================================================================
     #++++++++++++++ LOOP ++++++++++++++++#
+    # trigger garbage collection automatically once this many bytes have been allocated [rather than only when an allocation fails];
+    # set once the setup is done, so that it is sized for the steady state of the loop
+    # [collecting early keeps heap fragmentation low over long runs, without a blocking gc.collect() in every cycle]
+    gc.collect()
+    gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+    # hardware watchdog: resets the device if the loop hangs (e.g. on a stuck network call), rather than staying frozen;
+    # enabled only after the setup, and fed at the start of each cycle and throughout its idle time
+    # NOTE: the waits inside the loop (retries etc) feed it through utils.watchdog_sleep()
+    utils.enable_watchdog(config.WDT_TIMEOUT, logger=logger)
     try:
         # variable to keep track of time of the last attempted recovery for sensors
         last_attempt_time = time()
         # variable to keep track of the mqtt connection status
         MQTT_CONN = True
+        # deadline (ticks_ms) of the next cycle; the cycles are scheduled by this deadline rather than sleeping a fixed
+        # INTERVAL after each cycle, so the time taken by the cycle itself does not add up as drift in the publishing cadence
+        next_cycle = ticks_ms()
+        # bind the methods used in every cycle (and in its idle polling) once, rather than looking them up on each call
+        check_msg = client.check_msg # NOTE: the same client object is reused by the reconnects, so this stays valid
+        process_messages = feed_handler.process_messages
+        publish_data = mqtt_functions.publish_data
+        log_exception = logger.exception
+        publish_pending = logger.publish_pending
+        # the idle time waits on the mqtt socket for incoming data, rather than polling check_msg() periodically
+        poller = uselect.poll()
+        polled_sock = None # the socket registered with the poller [a reconnect replaces client.sock]
+        # deep sleep mode: every DEEP_SLEEP_COMMAND_WAKES-th wake (and the power on) stays awake through its first idle time, serving the commands
+        stay_awake = DEEP_SLEEP_MODE and config.DEEP_SLEEP_COMMAND_WAKES and wakes % config.DEEP_SLEEP_COMMAND_WAKES == 0
         # Loop
+        # NOTE: the exception handlers wrap the whole loop of the normal mode, rather than each of its cycles [so the fast path of
+        #       a cycle does not set up and tear down the handlers every time]; after a handled exception the loop is just re-entered,
+        #       and since each cycle begins by waiting out the idle time till its deadline, the publishing cadence is kept
         while True:
-            if SYSTEM_STATE == 0: # Normal Mode
-                # Normal operation
+            if SYSTEM_STATE == STATE_NORMAL: # Normal Mode
                 try:
-                    if sensors.recovery_needed and time()-last_attempt_time>1800: # each 30 minutes
-                        sensors.attempt_recovery()
-                        last_attempt_time = time()
-                        sleep(1) # wait a little for recovered sensor's next reading
+                    while SYSTEM_STATE == STATE_NORMAL:
+                        # sleep only for the remaining time till the deadline of this cycle
+                        delay = ticks_diff(next_cycle, ticks_ms())
+                        if delay > 0:
+                            if MQTT_CONN and client.sock is not polled_sock: # (re)connected since the last idle time
+                                try:
+                                    if polled_sock:
+                                        try:
+                                            poller.unregister(polled_sock)
+                                        except Exception:
+                                            pass
+                                    polled_sock = client.sock
+                                    poller.register(polled_sock, uselect.POLLIN)
+                                except Exception as e:
+                                    log_exception("MQTT socket poll registration error", e)
+                                    MQTT_CONN = False # reconnect in the next cycle
+                    
+                            if (DEEP_SLEEP_MODE or config.LIGHT_SLEEP_IDLE) and not stay_awake:
+                                # light sleep the idle time away [cpu halted, ram retained], or deep sleep it away [everything but the rtc off;
+                                # the device reboots on waking up, and main() runs from scratch]
+                                # NOTE: wifi (and hence the mqtt connection) is not maintained in light sleep [see the note in setup_with_retry()],
+                                #       so close both gracefully (no last will) and let the next cycle reconnect them after waking up
+                                if MQTT_CONN:
+                                    # first act on the commands that have already arrived (and let the queued log entries out),
+                                    # rather than dropping them along with the connection
+                                    try:
+                                        for _ in range(CallbackHandler.RING_SIZE):
+                                            if not poller.poll(0):
+                                                break
+                                            check_msg()
+                                        process_messages()
+                                        publish_pending()
+                                    except Exception as e:
+                                        log_exception("MQTT check message error", e)
+                                    mqtt_functions.disconnect_mqtt(client, logger=logger) # [its socket is already closed if the connection is down]
+                                wifi.disconnect()
+                                utils.feed_watchdog()
+                                if DEEP_SLEEP_MODE:
+                                    save_sleep_state(wakes, logger=logger)
+                                    if ds: # let the alarm wake the device [the INT/SQW pin is pulled low when the alarm fires]
+                                        esp32.wake_on_ext0(pin=ds.alarm_pin, level=esp32.WAKEUP_ALL_LOW)
+                                # sleep only for what is left of the idle time [draining the messages and disconnecting took some of it]
+                                delay = ticks_diff(next_cycle, ticks_ms())
+                                if DEEP_SLEEP_MODE:
+                                    utils.deep_sleep(max(delay, 1), logger=logger) # does not return
+                                utils.light_sleep(delay, logger=logger)
+                                MQTT_CONN = False
+                            else:
+                                # service the incoming mqtt messages (commands) throughout the idle time, rather than only once per cycle;
+                                # the wait returns as soon as data arrives on the mqtt socket, so a command is acted upon right away
+                                while delay > 0:
+                                    utils.feed_watchdog()
+                                    if MQTT_CONN:
+                                        try:
+                                            if poller.poll(min(delay, MQTT_POLL_TIMEOUT)):
+                                                check_msg()
+                                                process_messages()
+                                            publish_pending(4)
+                                        except Exception as e:
+                                            log_exception("MQTT check message error", e)
+                                            MQTT_CONN = False # reconnect in the next cycle
+                                    else:
+                                        sleep_ms(min(delay, MQTT_POLL_TIMEOUT))
+                                    delay = ticks_diff(next_cycle, ticks_ms())
+                                stay_awake = False # [deep sleep mode: only for the one idle time]
+                        else: # the previous cycle overran its deadline (e.g. due to reconnects); so start this one right away and schedule from now
+                            next_cycle = ticks_ms()
+                        next_cycle = ticks_add(next_cycle, INTERVAL * 1000) # deadline of the next cycle
                         
-                    if not wifi.isconnected():
-                        logger.warning("Device status: Disconnected from Wi-Fi")
-                        wifi = setup_with_retry(connect_wifi.connect_to_wifi, config.wifi_networks,
-                                        max_retries = 7, backoff_base = 15,
-                                        light_sleep_duration=config.LONG_SLEEP_DURATION,
-                                        led=led,
-                                        logger=logger)
+                        utils.feed_watchdog()
+                        # Normal operation
+                        if sensors.recovery_needed and time()-last_attempt_time>1800: # each 30 minutes
+                            sensors.attempt_recovery()
+                            last_attempt_time = time()
+                            sleep(1) # wait a little for recovered sensor's next reading
                         
-                        MQTT_CONN = False # since, wifi got disconnected
+                        if not wifi.isconnected():
+                            logger.warning("Device status: Disconnected from Wi-Fi")
+                            wifi = setup_with_retry(connect_wifi.connect_to_wifi, config.wifi_networks,
+                                            max_retries = 7, backoff_base = 15,
+                                            light_sleep_duration=config.LONG_SLEEP_DURATION,
+                                            led=led,
+                                            logger=logger)
+                        
+                            MQTT_CONN = False # since, wifi got disconnected
                     
-                    if not MQTT_CONN and wifi.isconnected():
-                        # reconnect to mqtt server and re-subscribe to feeds
-                        setup_with_retry(mqtt_functions.connect_and_subscribe, client, [FEED_COMMAND],
-                                    max_retries = config.MAX_RETRIES, backoff_base = config.BACKOFF_BASE,
-                                    light_sleep_duration=config.LONG_SLEEP_DURATION//2,
-                                    led=led,
-                                    logger=logger)
-                        MQTT_CONN = True
+                        if not MQTT_CONN:
+                            MQTT_CONN = reconnect_mqtt(client, wifi, led=led, logger=logger)
                     
-                    try:
-                        client.check_msg() # Check for any incoming MQTT messages (will raise an error if mqtt connection is lost)
-                    except OSError as e:
-                        logger.error(f"MQTT check message error (OSError): {e}")
-                        if wifi.isconnected():
-                            # reconnect to mqtt server and re-subscribe to feeds
-                            setup_with_retry(mqtt_functions.connect_and_subscribe, client, [FEED_COMMAND],
-                                        max_retries = config.MAX_RETRIES, backoff_base = config.BACKOFF_BASE,
-                                        light_sleep_duration=config.LONG_SLEEP_DURATION//2,
-                                        led=led,
-                                        logger=logger)
-                    except Exception as e:
-                        logger.error(f"MQTT check message error (Other): {e}")
-                        if wifi.isconnected():
-                            # reconnect to mqtt server and re-subscribe to feeds
-                            setup_with_retry(mqtt_functions.connect_and_subscribe, client, [FEED_COMMAND],
-                                        max_retries = config.MAX_RETRIES, backoff_base = config.BACKOFF_BASE,
-                                        light_sleep_duration=config.LONG_SLEEP_DURATION//2,
-                                        led=led,
-                                        logger=logger)
+                        try:
+                            check_msg() # Check for any incoming MQTT messages (will raise an error if mqtt connection is lost)
+                            process_messages() # execute the received ones
+                        except Exception as e:
+                            log_exception("MQTT check message error", e)
+                            reconnect_mqtt(client, wifi, led=led, logger=logger)
                     
-                    # publish the data to mqtt server
-                    mqtt_functions.publish_data(client, gather_and_organize_data(sensors, logger=logger), logger=logger)
-                    gc.collect()
-                
+                        # publish the data to mqtt server
+                        data = gather_and_organize_data(sensors, logger=logger)
+                        if data: # [None while a batch of samples is being collected, or if gathering failed]
+                            publish_data(client, data, frame=PUBLISH_FRAME, logger=logger)
+                            del sample_batch[:batch_count] # published; so these batched samples (if any) are done
+                        publish_pending(4) # the connection is healthy; so publish (a few of) the queued log messages
+
                 except MQTTPublishingError as mpe:
                     logger.critical(f"MQTT data publishing error occurred: {mpe}. Reconnect the mqtt client.")
                     MQTT_CONN = False
                     
                 except SetupError as se:
                     logger.critical(f"Setup error occurred: {se}. Resetting the Device...")
-                    sleep(10) # take a little break before resetting, to let actions like logging complete
-                    machine.reset()
+                    logger.flush() # let actions like logging complete before resetting
+                    machine.reset() # [not soft_reset(), since the watchdog is enabled by now]
                 
                 except Exception as e:
-                    logger.error(f"Unknown main loop exception: {e}", publish=True)
+                    log_exception("Unknown main loop exception", e, publish=True)
                     
                 except KeyboardInterrupt:
                     raise
-                
-                sleep(INTERVAL) # Adjust as per rquirement
             
-            elif SYSTEM_STATE == 1: # degraded mode
+            elif SYSTEM_STATE == STATE_DEGRADED: # degraded mode
                 # Limited functionality
                 '''handle degraded mode'''
                 # handle_degraded_operation()
                 # like regular attept to recover sensors 
                 
-            elif SYSTEM_STATE == 2: # maintenace mode
+            elif SYSTEM_STATE == STATE_MAINTENANCE: # maintenace mode
                 # Enter maintenance mode
                 '''handle maintenance mode'''
                 # enter_maintenance_mode()
         
     except Exception as e:
-        logger.error(f"Exception occurred: {e}. Enter maintenace mode.")
+        logger.exception("Exception occurred. Enter maintenace mode", e)
         '''enter maintenance mode'''
         
     except KeyboardInterrupt:
@@ -653,9 +1073,7 @@ if __name__ == "__main__":
     IMPROVEMENTS:
     1. Implement basic error handling to check if the wifi network is up before attempting a mqtt connection,
        in the mqtt_connect function, reducing unnecessary retries.
-    2. Use Persistent Sessions:
-        Set clean_session=False when connecting. This allows the broker to remember your subscriptions and pending messages (if any),
-        so you don’t need to resubscribe on every reconnection. [Ensure that the broker allows for persistent
-        sessions i.e. not every broker especially free tier cloud version keeps track of previous
-        session or pending messages or subscriptions or even qos in many cases.]
+    NOTE: persistent sessions (config.MQTT_CLEAN_SESSION = False) rely on the broker keeping the session; not every broker
+          (especially the free tier cloud ones) keeps the previous session, its pending messages, subscriptions or even qos.
+          [the subscription is still made whenever the broker reports no session present]
     '''
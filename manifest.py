@@ -0,0 +1,15 @@
+# firmware manifest - to freeze the third party http client into the firmware
+# [frozen bytecode runs directly from flash, so it is neither parsed at import nor kept on the GC heap]
+'''
+build the firmware with this manifest, e.g. for esp32:
+    cd micropython/ports/esp32
+    make BOARD=ESP32_GENERIC FROZEN_MANIFEST=/path/to/OTA-Update/manifest.py
+'''
+# NOTE: our own code (main.py, modules/, lib/) is deliberately NOT frozen,
+#       since frozen modules take precedence over the files on the filesystem and would shadow the OTA updates
+
+# keep the port's default frozen modules (ntptime, umqtt etc)
+include("$(PORT_DIR)/boards/manifest.py")
+
+# http client used by download_file.py for the OTA downloads
+require("urequests")
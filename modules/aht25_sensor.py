@@ -10,24 +10,25 @@ sys.path.append('/modules')
 '''
 import aht  # Import the aht library
 
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
 
 class AHT25:
-    def __init__(self, i2c_scl, i2c_sda, i2c_freq=100000, i2c_address=0x38,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+    def __init__(self, i2c_scl, i2c_sda, i2c_freq=100000, i2c=None, i2c_address=0x38,
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initializes the AHT25 sensor.
 
         :param i2c_scl: GPIO pin for I2C clock
         :param i2c_sda: GPIO pin for I2C data
         :param i2c_freq: Frequency for I2C communication (100k by deault - a good value for reliable and non high speed measurement)
+        :param i2c: An already initialized I2C bus to use [e.g. shared by all the sensors on it], instead of creating a new one
         :param i2c_address: I2C address of the AHT25 sensor (default address is 0x38)
         :param logger: an instance of Logger class
         """
         try:
             self.logger = logger  # Store logger as instance variable
             
-            self.i2c = I2C(0, scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
+            self.i2c = i2c if i2c is not None else I2C(0, scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
             self.sensor = aht.AHT2x(self.i2c, address=i2c_address, crc=True)
             self.logger.info("AHT25 sensor initialized successfully.", publish=True)
         except Exception as e:
@@ -41,10 +42,10 @@ class AHT25:
         :return: A tuple (temperature in °C, relative humidity in %)
         """
         try:
-            if self.sensor.is_ready:
+            if self.sensor.is_ready: # triggers a single measurement which sets both temperature and humidity
                 return self.sensor.temperature, self.sensor.humidity
             else:
-                self.logger.error(f"Error reading AHT25 sensor measurements: {e}")
+                self.logger.error("Error reading AHT25 sensor measurements: sensor busy or crc mismatch")
                 return None, None
         except Exception as e:
             self.logger.error(f"Error reading AHT25 sensor measurements: {e}")
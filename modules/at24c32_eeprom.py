@@ -5,27 +5,41 @@
 size of AT24C32 = 32Kb (kilo bits) = 4KB (kilo bytes) = 4096 bytes
 '''
 
-from machine import SoftI2C, Pin
+from machine import I2C, SoftI2C, Pin
 from eeprom import EEPROM
 
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
 
 class AT24C32:
     def __init__(self, i2c_scl, i2c_sda,
-                 i2c_freq=100000, eeprom_address=0x57,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 i2c_freq=400000, eeprom_address=0x57, i2c_id=1, i2c=None,
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initialize the I2C bus and the EEPROM
 
+        NOTE: on the ds3231 + at24c32 module, the eeprom shares the bus (softsclPIN/softsdaPIN) of the ds3231, which drives those pins
+              with SoftI2C; so, when the ds3231 is in use, pass its bus as 'i2c' [i.e. i2c=ds.i2c]. Otherwise a second bus object
+              (the hardware I2C opened below) would fight the ds3231's one over the same pins.
+
         :param i2c_scl: GPIO pin for I2C clock
         :param i2c_sda: GPIO pin for I2C data
-        :param i2c_freq: Frequency for I2C communication
+        :param i2c_freq: Frequency for I2C communication [AT24C32 supports up to 400 kHz]
         :param eeprom_address: I2C address of the EEPROM
+        :param i2c_id: Hardware I2C peripheral to use [bus 0 is used by the sensors]
+        :param i2c: An already initialized I2C bus to use instead [e.g. when it is shared with the ds3231 on the same module,
+                    since the same pins can not be driven by two bus objects]
         :param logger: an instance of Logger class
         """
         try:
             self.logger = logger
-            self.i2c = SoftI2C(scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
+            if i2c is None:
+                # hardware i2c peripheral [the transfers run in hardware, rather than bit-banging each bit by the cpu as SoftI2C does]
+                try:
+                    i2c = I2C(i2c_id, scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
+                except Exception as e:
+                    self.logger.warning(f"Hardware I2C unavailable for EEPROM ({e}), using SoftI2C instead.")
+                    i2c = SoftI2C(scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
+            self.i2c = i2c
             self.at24c32 = EEPROM(addr=eeprom_address, pages=128, # for AT24C32 i.e. of 32Kb
                                  bpp = 32, at24x=32, # 32 Kb eeprom
                                  i2c=self.i2c)
@@ -120,8 +134,13 @@ if __name__ == "__main__":
     # Initialize logger instance
     logger = Logger(debug_mode=config.DEBUG_MODE)
     try:
-        # Initialize the EEPROM
+        # Initialize the EEPROM [on the bus of the ds3231, if it is there; see the note in AT24C32.__init__()]
+        from ds3231rtc import ds3231
+        ds = utils.retry_with_backoff(ds3231, config.softsclPIN, config.softsdaPIN, config.alarmPIN,
+                                      max_retries=3, backoff_base=5,
+                                      logger=logger)
         at32 = utils.retry_with_backoff(AT24C32, config.softsclPIN, config.softsdaPIN,
+                                          i2c=ds.i2c if ds else None,
                                           max_retries=3, backoff_base=10,
                                           logger=logger)
 
@@ -10,17 +10,35 @@ sys.path.append('/modules')
 '''
 from bmp280 import *
 
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
+
+# the library reads the data registers (over i2c) afresh on each access of temperature and of pressure;
+# read() gets both of them from a single burst read [half the i2c traffic, and both from the same conversion]
+class _BMP280(BMP280):
+    _gauged = False # True while the last read data registers are to be reused
+    
+    def _gauge(self):
+        if not self._gauged:
+            BMP280._gauge(self)
+    
+    def read(self):
+        t = self.temperature # reads the data registers
+        self._gauged = True
+        try:
+            return t, self.pressure
+        finally:
+            self._gauged = False
 
 class BMP280Driver:
-    def __init__(self, i2c_scl, i2c_sda, i2c_freq=100000, i2c_address=0x76, use_case=BMP280_CASE_WEATHER,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+    def __init__(self, i2c_scl, i2c_sda, i2c_freq=100000, i2c=None, i2c_address=0x76, use_case=BMP280_CASE_WEATHER,
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initializes the BMP280 sensor.
 
         :param i2c_scl: GPIO pin for I2C clock
         :param i2c_sda: GPIO pin for I2C data
         :param i2c_freq: Frequency for I2C communication (100k by deault - a good value for reliable and non high speed measurement)
+        :param i2c: An already initialized I2C bus to use [e.g. shared by all the sensors on it], instead of creating a new one
         :param i2c_address: I2C address of the BMP280 sensor (default address is 0x76)
         :use_case: use case of bmp280
         # choose the preferred use case:
@@ -37,8 +55,8 @@ class BMP280Driver:
         try:
             self.logger = logger  # Store logger as instance variable
             
-            self.i2c = I2C(0, scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
-            self.sensor = BMP280(self.i2c, addr=i2c_address, use_case=use_case)
+            self.i2c = i2c if i2c is not None else I2C(0, scl=Pin(i2c_scl), sda=Pin(i2c_sda), freq=i2c_freq)
+            self.sensor = _BMP280(self.i2c, addr=i2c_address, use_case=use_case)
             self.logger.info("BMP280 sensor initialized successfully.", publish=True)
         except Exception as e:
             self.logger.critical(f"Failed to initialize the BMP280 sensor: {e}", publish=True)
@@ -51,7 +69,7 @@ class BMP280Driver:
         :return: A tuple (temperature in °C, pressure in Pa)
         """
         try:
-            return self.sensor.temperature, self.sensor.pressure
+            return self.sensor.read()
         except Exception as e:
             self.logger.error(f"Error reading BMP280 sensor measurements: {e}")
             return None, None
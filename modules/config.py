@@ -12,6 +12,14 @@ wifi_networks = [
 sdaPIN = 21
 sclPIN = 22
 
+# Soft I2C Pins [ds3231 rtc and at24c32 eeprom module]
+softsdaPIN = 26
+softsclPIN = 25
+alarmPIN = 27 # ds3231 INT/SQW pin
+
+# 1-Wire Pin [ds18b20]
+ONEWIRE_PIN = 4
+
 # SPI Pins
 SPI_PIN_MISO = 19
 SPI_PIN_MOSI = 23
@@ -22,20 +30,53 @@ SPI_PIN_CS = 5
 # set to None if system doesn't have an led
 LED_PIN = 2 # onboard led gpio pin for esp32
 
+# outside weather api
+weather_provider = 1 # 1 for openweathermap, 2 for tomorrow.io
 owm_api_key = 'key'
-latitude = lat
-longitude = long
+tom_api_key = 'key'
+latitude = 0.0
+longitude = 0.0
+OWM_URL = f'http://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={owm_api_key}&units=metric'
+OWM_HEADERS = {}
+TOM_URL = f'https://api.tomorrow.io/v4/weather/realtime?location={latitude},{longitude}&apikey={tom_api_key}&units=metric'
+TOM_HEADERS = {"accept": "application/json"}
 
 AdafruitIO_USER = b'user'
 AdafruitIO_KEY = 'key'
 AdafruitIO_SERVER = 'io.adafruit.com'
 AdafruitIO_PORT = 1883
 
+# mqtt brokers [the one in use is selected by BROKER]
+BROKER = 'adafruit'
+mqtt = {
+    'adafruit': {
+        'client_id': 'esp32-weather', # must stay the same across the boots [the broker keeps our session by it; see MQTT_CLEAN_SESSION]
+        'server': AdafruitIO_SERVER,
+        'port': AdafruitIO_PORT,
+        'user': AdafruitIO_USER,
+        'password': AdafruitIO_KEY,
+        'feeds': {
+            'aht': {'temp': 'user/feeds/aht-temp', 'hum': 'user/feeds/aht-hum'},
+            'bmp': {'temp': 'user/feeds/bmp-temp', 'press': 'user/feeds/bmp-press'},
+            'ds18b20': {'temp': 'user/feeds/ds18b20-temp'},
+            'out': {'temp': 'user/feeds/out-temp', 'feels_like_temp': 'user/feeds/out-feels-like-temp',
+                    'hum': 'user/feeds/out-hum', 'press': 'user/feeds/out-press'},
+            'status': 'user/feeds/status', # errors and status
+            'command': 'user/feeds/command', # commands to the device
+            'combined': 'user/feeds/combined', # all the readings as one json message [only used with BATCH_MQTT]
+        },
+    },
+}
+
 KEEP_ALIVE_INTERVAL = 120 # sec
+MQTT_CLEAN_SESSION = False # keep the mqtt session (subscriptions, queued commands) on the broker across reconnects [so no resubscribing]
 
 MAX_RETRIES = 5  # Max connection retries before long sleep
 BACKOFF_BASE = 10  # Base seconds for exponential backoff
+BACKOFF_JITTER = 0.25  # each backoff delay is randomly spread by +-25% [so that many devices do not retry in lock-step after a shared outage]
+BACKOFF_MAX_DELAY = 300  # Cap the backoff delay at 5 minutes (in sec)
 LONG_SLEEP_DURATION = 3600 * 1000 # millisec [= 1 hour]
+WDT_TIMEOUT = 60 * 1000 # millisec [hardware watchdog timeout; the device is reset if the main loop hangs for longer than this]
 
 LAST_WILL_MESSAGE = b"ESP32 disconnected unexpectedly"
 
@@ -43,8 +84,17 @@ LOG_FILE = '/errors.log' # '/sd/errors.log'
 MAX_SIZE_BYTES = 100 * 1024  # in bytes (= 100 KB) [max allowed size of log files in bytes]
 
 DEBUG_MODE = True
+LOG_LEVEL = 'INFO' # minimum level of the logged messages ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
 
 UPDATE_INTERVAL = 60 # sec [interval between weather readings update]
+WEATHER_HTTP_TIMEOUT_S = 15 # sec [socket timeout of the weather api requests; keep it well under WDT_TIMEOUT]
+LIGHT_SLEEP_IDLE = False # light sleep between the updates to save power [wifi and mqtt are then reconnected on every update, and commands sent while asleep are missed]
+BATCH_MQTT = False # publish all the readings as a single json message to the "combined" feed [rather than one message per feed]
+BATCH_SAMPLES = 1 # with BATCH_MQTT, number of samples published together as one json array [1 = each sample is published right away]
+                  # NOTE: adafruit io rejects a value over 1 KB (~5 samples); so a longer batch is published early, in parts of at most 1 KB
+DEEP_SLEEP_MODE = False # deep sleep between the updates [~10 uA instead of ~80 mA; the device reboots on each wake, and the commands sent meanwhile
+                        # are delivered by the broker on a later wake, provided MQTT_CLEAN_SESSION = False]
+DEEP_SLEEP_COMMAND_WAKES = 10 # with DEEP_SLEEP_MODE, every this many wakes the device stays awake for one update interval to serve the commands [0 = never]
 
 #########################
 REPO_OWNER = 'imninety9'
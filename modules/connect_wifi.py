@@ -8,37 +8,79 @@ that has internet connectivity.
 
 import network
 import usocket
-from time import sleep
+import uselect
+from time import sleep_ms, ticks_ms, ticks_diff, ticks_add
 
-from simple_logging import Logger  # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER  # Import the Logger class
+
+# a successful internet check is trusted for this long, rather than probing again [e.g. right after the check of a reconnect attempt]
+CHECK_INTERNET_TTL = 60 * 1000 # millisec
+last_internet_ok = None # ticks_ms of the last successful internet check
+# a rejection status (wrong password / no ap found) is taken as final only once it has lasted this long [on esp32 these statuses
+# can also show up briefly while the connection is still being set up]
+REJECT_GRACE_MS = 3000 # millisec
 
 # Internet connectivity check
-def check_internet(hosts=[("8.8.8.8", 53), ("1.1.1.1", 53)], timeout=3, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def check_internet(hosts=[("8.8.8.8", 53), ("1.1.1.1", 53)], timeout=1.5, ttl=CHECK_INTERNET_TTL,
+                   logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Check if the device has internet connectivity by attempting to open a socket to a DNS server."""
-    '''Added a fallback to a secondary server (e.g., Cloudflare 1.1.1.1) in case the primary check fails.'''
-    for host, port in hosts:
-        try:
+    '''The connections to all the hosts (e.g. google 8.8.8.8 and cloudflare 1.1.1.1) are attempted at once, and the first
+       one to get connected wins [rather than trying them one after another, where a slow host delays the others].'''
+    '''If a check succeeded within the last 'ttl' millisec, then it is not repeated [pass ttl=0 to force the check].'''
+    '''timeout (sec) bounds the whole check, since the hosts are probed at once; a probe not connected within ~1.5 sec is far more
+       likely blocked (e.g. port 53 filtered) than just slow.'''
+    global last_internet_ok
+    if last_internet_ok is not None and ticks_diff(ticks_ms(), last_internet_ok) < ttl:
+        return True
+    last_internet_ok = None
+    
+    poller = uselect.poll()
+    socks = []
+    try:
+        # start the (non blocking) connections to all the hosts
+        for host, port in hosts:
             sock = usocket.socket()
-            sock.settimeout(timeout)
-            sock.connect((host, port))
+            socks.append(sock)
+            sock.setblocking(False)
+            try:
+                sock.connect((host, port))
+            except OSError: # EINPROGRESS [any real error is reported by the poll below]
+                pass
+            poller.register(sock, uselect.POLLOUT)
+        
+        # wait for the first one to get connected
+        pending = len(socks)
+        deadline = ticks_add(ticks_ms(), int(timeout * 1000))
+        while pending:
+            remaining = ticks_diff(deadline, ticks_ms())
+            if remaining <= 0:
+                break
+            for entry in poller.poll(remaining):
+                sock, event = entry[0], entry[1]
+                if event & (uselect.POLLERR | uselect.POLLHUP): # failed to connect to this host
+                    poller.unregister(sock)
+                    pending -= 1
+                elif event & uselect.POLLOUT: # connected
+                    last_internet_ok = ticks_ms()
+                    return True
+    except Exception as e:
+        logger.error(f"Internet check error: {e}")
+    finally:
+        for sock in socks:
             sock.close()
-            logger.info(f"Internet check successful with {host}:{port}.")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to {host}:{port}: {e}")
     logger.error("Internet check failed for all hosts.")
     return False
     '''
     Explanation-
     usocket.socket(): Creates a socket object to establish a connection.
-    sock.settimeout(timeout): This ensures that the socket does not block for too long (thus reducing power usage).
+    sock.setblocking(False): connect() returns right away, and its completion is then reported by the poller [POLLOUT when connected].
     sock.connect((host, port)): Attempts to connect to the specified host and port. Google DNS (8.8.8.8) on port 53 is commonly used because it's reliable and always reachable.
     sock.close(): Closes the socket after use to free up resources.
-    Timeout: If the connection attempt fails (e.g., due to no internet), it will raise an exception, and the function will return False.
+    Timeout: If no connection gets through (e.g., due to no internet) within the timeout, the function will return False.
     '''
 
 # Disable access point (AP) mode if required
-def disable_ap_mode(logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def disable_ap_mode(logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     try:
         ap = network.WLAN(network.AP_IF)
         if ap.active():
@@ -48,7 +90,7 @@ def disable_ap_mode(logger: Logger = Logger()): # logger is expected to be of ty
         logger.error(f"Failed to disable WiFi AP mode: {e}")
 
 # Disable station aka client (STA) mode if required
-def disable_sta_mode(logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def disable_sta_mode(logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     try:
         sta = network.WLAN(network.STA_IF)
         if sta.active():
@@ -58,7 +100,8 @@ def disable_sta_mode(logger: Logger = Logger()): # logger is expected to be of t
         logger.error(f"Failed to disable WiFi AP mode: {e}")
         
 # Connect to a WiFi given a list of wifi_networks with their ssid and priority
-def connect_to_wifi(wifi_networks, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def connect_to_wifi(wifi_networks, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
+    global last_internet_ok
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     
@@ -76,8 +119,10 @@ def connect_to_wifi(wifi_networks, logger: Logger = Logger()): # logger is expec
 
     logger.info("Scanning for available networks...")
     try:
-        available_networks = wlan.scan()
-        available_ssids = {net[0].decode('utf-8') for net in available_networks}
+        # keep only the configured ssids among the visible networks [compared as the raw bytes of the scan, without decoding
+        # each visible network's ssid; in a crowded area the scan lists dozens of networks, while only a few are configured]
+        configured = {wifi_network['ssid'].encode() for wifi_network in wifi_networks}
+        available_ssids = {net[0] for net in wlan.scan() if net[0] in configured}
     except Exception as e:
         logger.error(f"Error during WiFi scan: {e}")
         return None
@@ -86,23 +131,36 @@ def connect_to_wifi(wifi_networks, logger: Logger = Logger()): # logger is expec
     #wifi_networks.sort(key=lambda x: x['priority'], reverse=True)
     for wifi_network in wifi_networks: # wifi_networks is the list of networks given with their priority
         try:
-            if wifi_network['ssid'] in available_ssids:
+            if wifi_network['ssid'].encode() in available_ssids:
                 logger.info(f"Trying to connect to {wifi_network['ssid']}...")
                 wlan.connect(wifi_network['ssid'], wifi_network['password'])
+                last_internet_ok = None # a new connection; so do not trust the last internet check
 
-                timeout = 10  # seconds
-                for _ in range(timeout):
-                    if wlan.isconnected():
+                # wait (at most 10 sec) for the connection in short steps [it usually takes well under a second],
+                # and give up early if the network keeps rejecting us
+                deadline = ticks_add(ticks_ms(), 10 * 1000)
+                rejected_since = None # ticks_ms since when the network has been rejecting us
+                while ticks_diff(deadline, ticks_ms()) > 0:
+                    status = wlan.status()
+                    if status == network.STAT_GOT_IP:
                         logger.info(f"Connected to {wifi_network['ssid']}. Checking internet...")
                         if check_internet(logger=logger):
                             logger.info("Internet is accessible.")
                             return wlan
                         else:
                             logger.warning("No internet. Disconnecting...")
-                            wlan.disconnect()
                             break
-                    sleep(1)
+                    if status == network.STAT_WRONG_PASSWORD or status == network.STAT_NO_AP_FOUND:
+                        if rejected_since is None:
+                            rejected_since = ticks_ms()
+                        elif ticks_diff(ticks_ms(), rejected_since) >= REJECT_GRACE_MS:
+                            break
+                    else:
+                        rejected_since = None
+                    sleep_ms(100)
 
+                # stop the driver from retrying this network, while the next one is being joined
+                wlan.disconnect()
                 logger.warning(f"Failed to connect to {wifi_network['ssid']}")
         except Exception as e:
             logger.error(f"Error during WiFi connection attempt: {e}")
@@ -5,18 +5,23 @@ import gc  # Garbage collector for memory management
 import time  # For retry delay
 import os
 import hashlib # For checksum validation
+from binascii import hexlify
 '''
 # to enable imports from a subfolder named 'modules'
 import sys
 sys.path.append('/modules')
 '''
-from simple_logging import Logger # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER # Import the Logger class
+from utils import feed_watchdog, watchdog_sleep
+
+GC_EVERY_BYTES = 16 * 1024 # bytes [garbage is collected during a download once per this many downloaded bytes, rather than after each chunk;
+                           #        nor is the free heap checked per chunk, since gc.mem_free() itself scans the whole allocation table]
     
 # function to download a file from github public repo over the air
 def download_large_file(url, filename, max_retries=3, retry_delay=5,
                         initial_chunk_size=512, max_chunk_size=2048,  # Adjust chunk size as necessary
                         read_timeout=15, checksum=None,
-                        logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                        logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     def print_progress_bar(bytes_downloaded, total_size, speed, bar_length=50):
         if total_size > 0:
             progress_percent = bytes_downloaded * 100 // total_size
@@ -26,25 +31,9 @@ def download_large_file(url, filename, max_retries=3, retry_delay=5,
         else:
             print(f'\rDownloaded {bytes_downloaded} bytes at {speed} bytes/sec)', end='')
     
-    # checksum to validate the download is not corrupted:
-    # sha256 checksum is applied below, change as per requirement
-    def validate_checksum(file_path, expected_checksum, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
-        sha256 = hashlib.sha256()
-        try:
-            with open(file_path, 'rb') as f:
-                while True:
-                    chunk = f.read(4096) # Adjust chunk size as needed
-                    if not chunk:
-                        break
-                    sha256.update(chunk)
-            checksum_bytes = sha256.digest()
-            checksum_hex = ''.join('{:02x}'.format(byte) for byte in checksum_bytes)
-            return checksum_hex == expected_checksum
-        except Exception as e:
-            logger.error(f"Error during checksum validation: {e}", publish=True)
-            return False
-    
     headers = {}
+    # one read buffer for the whole download [the chunks are read into it, rather than each read allocating a new bytes object]
+    mv = memoryview(bytearray(max_chunk_size))
     retry_count = 0
     start_time = time.ticks_ms()
     current_chunk_size = initial_chunk_size
@@ -59,23 +48,39 @@ def download_large_file(url, filename, max_retries=3, retry_delay=5,
             # and maybe something else.
             if response.status_code == 200: # 200 is OK
                 total_size = int(response.headers.get('Content-Length', 0)) # .get() method of dictionaries: if Content-Length is not present it returns 0   
+                if 0 < total_size <= max_chunk_size * 4: # a small file: skip the chunk size ramp up [it would take most of the download]
+                    current_chunk_size = max_chunk_size
             else:
                 raise Exception(f"Unexpected HTTPS status code: {response.status_code}")
 
             logger.info(f"Downloading {filename}", publish=True)
 
+            # checksum to validate the download is not corrupted: sha256 is computed over the chunks as they are downloaded
+            # [rather than reading the whole file back from the flash afterwards]; change as per requirement
+            sha256 = hashlib.sha256() if checksum else None
             with open(f'{filename}.new', 'wb') as f:
                 bytes_downloaded = 0                    
+                since_gc = 0 # bytes downloaded since the last garbage collection
                 gc.collect()
                 while True:
-                    chunk = response.raw.read(current_chunk_size)
-                    if not chunk:
+                    size = current_chunk_size
+                    if total_size: # do not read past the content [the end is then known without waiting for the server to close]
+                        size = min(size, total_size - bytes_downloaded)
+                        if size <= 0:
+                            break
+                    n = response.raw.readinto(mv[:size])
+                    if not n:
                         break
+                    chunk = mv[:n]
                     f.write(chunk)
-                    bytes_downloaded += len(chunk)
-                    #print(gc.mem_free(),len(chunk))
-                    gc.collect()  # Perform garbage collection to manage memory
-                    #print(gc.mem_free(),len(chunk))
+                    if sha256:
+                        sha256.update(chunk)
+                    bytes_downloaded += n
+                    feed_watchdog() # a large download may take longer than the watchdog timeout
+                    since_gc += n
+                    if since_gc >= GC_EVERY_BYTES: # [a full collection after each chunk is mostly wasted work]
+                        gc.collect()  # Perform garbage collection to manage memory
+                        since_gc = 0
                     
                     now = time.ticks_ms()
                     elapsed_time = now - start_time
@@ -90,10 +95,9 @@ def download_large_file(url, filename, max_retries=3, retry_delay=5,
             logger.info(f"Download of {filename} completed.", publish=True)
             
             gc.collect()
-            time.sleep_ms(500)
             # verify the just downloaded file if checksum is given
-            if checksum:
-                if validate_checksum(filename, checksum, logger=logger):
+            if sha256:
+                if hexlify(sha256.digest()) == checksum.encode(): # [hex digits in lowercase]
                     logger.info("Checksum validation passed.", publish=True)
                     return True
                 else:
@@ -109,7 +113,7 @@ def download_large_file(url, filename, max_retries=3, retry_delay=5,
             if retry_count < max_retries:
                 retry_interval = retry_delay * (2 ** (retry_count - 1))  # Exponential backoff
                 logger.info(f"Retrying in {retry_interval} seconds...", publish=True)
-                time.sleep(retry_interval)
+                watchdog_sleep(retry_interval) # [feeds the watchdog meanwhile]
             else:
                 logger.error(f"Max retries exceeded. Failed to download {filename}.", publish=True)
                 return False
@@ -121,7 +125,7 @@ def download_large_file(url, filename, max_retries=3, retry_delay=5,
             if retry_count < max_retries:
                 retry_interval = retry_delay * (2 ** (retry_count - 1))  # Exponential backoff
                 logger.info(f"Retrying in {retry_interval} seconds...", publish=True)
-                time.sleep(retry_interval)
+                watchdog_sleep(retry_interval) # [feeds the watchdog meanwhile]
             else:
                 logger.error(f"Max retries exceeded. Failed to download {filename}.", publish=True)
                 return False
@@ -142,7 +146,7 @@ def file_exists(filename):
         
 # download and save the file in the microcontroller (by replacing its older version, if exists)    
 def dwnld_and_update(url, filename, checksum=None,  # filename is the full filename of the file including the directory structure
-                     logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                     logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     time.sleep_ms(500)
     try:
         if download_large_file(url, filename, checksum=checksum, logger=logger):
@@ -9,7 +9,7 @@ import time
 import sys
 sys.path.append('/modules')
 '''
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
 
 '''
 Note: As we can connect and use  multiple DS18B20 sensors on the same data line,
@@ -38,7 +38,7 @@ Resolution table with the wait time taken for conversion and precision:
 
 class DS18B20:
     def __init__(self, pin,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initialize the DS18B20 sensor(s).
         :param pin: GPIO pin number where the DATA line is connected.
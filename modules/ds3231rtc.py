@@ -2,14 +2,13 @@
 
 from machine import Pin, SoftI2C
 from ds3231_gen import *
-import ntptime
 import time
 
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
 
 class ds3231:
     def __init__(self, sclPIN, sdaPIN, alarmPIN,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         '''initialize ds3231 rtc object'''
         try:
             self.logger = logger  # Store logger as instance variable
@@ -52,6 +51,7 @@ class ds3231:
     def sync_time_with_ntp(self):
         '''sync ds3231 time with ntp server'''
         try:
+            import ntptime # imported here, as it is needed only on a sync [rather than occupying the heap since boot]
             ntptime.host = 'pool.ntp.org' # UTC
             # ntptime.time() returns seconds from epoch
             self.set_time(time.localtime(ntptime.time() + 19800)) # IST = UTC + 19800 (in sec)
@@ -0,0 +1,149 @@
+# http session - minimal HTTP/1.1 client over raw sockets that keeps its connections alive across requests
+
+'''
+    Rather than opening a new connection (dns lookup + tcp handshake [+ tls handshake]) and allocating a new response
+    object (as urequests does) on every request; a Session keeps one open socket per (host, port) and reads the
+    response bodies into a single preallocated buffer.
+
+    NOTE: only the simple GET requests with a Content-Length response (i.e. not chunked) are supported.
+'''
+import usocket
+'''
+# to enable imports from a subfolder named 'modules'
+import sys
+sys.path.append('/modules')
+'''
+
+# split a url into its parts [e.g. 'http://api.openweathermap.org/data/2.5/weather?lat=..']
+# returns (tls, host, port, path)
+def split_url(url):
+    proto, _, host, path = url.split('/', 3)
+    port = 443 if proto == 'https:' else 80
+    if ':' in host:
+        host, port = host.split(':', 1)
+        port = int(port)
+    return proto == 'https:', host, port, '/' + path
+
+# compose the complete GET request as bytes [compose it only once, and then send it as it is on each request]
+def build_get_request(host, path, headers=None):
+    return b"".join([b"GET ", path.encode(), b" HTTP/1.1\r\nHost: ", host.encode(), b"\r\n"] +
+                    [f"{k}: {v}\r\n".encode() for k, v in (headers or {}).items()] +
+                    [b"Connection: keep-alive\r\n\r\n"])
+
+class Session:
+    def __init__(self, buffer_size=1024, timeout=15):
+        """
+        Initializes the session.
+
+        :param buffer_size: Size of the preallocated buffer for the response bodies in bytes [larger responses are rejected]
+        :param timeout: Socket timeout in seconds [otherwise without timeout, the program may hang for a very long indefinite time
+                        in case the server does not respond due to unreliable network, etc]
+        """
+        self.sockets = {} # open keep-alive sockets: (host, port) => socket
+        self.buffer = bytearray(buffer_size)
+        self.timeout = timeout
+
+    def get_socket(self, host, port, tls=False):
+        """Returns the open socket to (host, port), or opens a new one."""
+        sock = self.sockets.get((host, port))
+        if sock is None:
+            addr = usocket.getaddrinfo(host, port)[0][-1]
+            sock = usocket.socket()
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(addr)
+                if tls:
+                    import ussl
+                    sock = ussl.wrap_socket(sock, server_hostname=host)
+            except Exception as e:
+                sock.close()
+                raise e
+            self.sockets[(host, port)] = sock
+        return sock
+
+    def close(self, host, port):
+        """Closes the socket to (host, port), if open."""
+        sock = self.sockets.pop((host, port), None)
+        if sock:
+            try:
+                sock.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        """Closes all the open sockets."""
+        for host, port in list(self.sockets):
+            self.close(host, port)
+
+    def request(self, host, port, request, tls=False):
+        """
+        Sends the precomposed request [see build_get_request()] and reads its response.
+        The server may have closed an idle keep-alive connection since the last request; so, if a reused socket fails
+        then the request is retried once over a fresh connection. On any other error, the socket is closed (not reused).
+
+        :return: (status code, body) - NOTE: body is a memoryview into the session's buffer, so it is only valid until the next request
+        """
+        reused = (host, port) in self.sockets
+        try:
+            return self.send(host, port, request, tls)
+        except Exception as e:
+            self.close(host, port)
+            if not reused:
+                raise e
+        return self.send(host, port, request, tls)
+
+    def send(self, host, port, request, tls=False):
+        sock = self.get_socket(host, port, tls)
+        try:
+            sock.write(request)
+
+            # status line [e.g. b'HTTP/1.1 200 OK\r\n']
+            line = sock.readline()
+            if not line:
+                raise OSError("Connection closed by the server")
+            status_code = int(line.split(None, 2)[1])
+            # headers: we only need the length of the body and whether the server keeps the connection open
+            content_length = None
+            keep_alive = True
+            while True:
+                line = sock.readline()
+                if not line or line == b'\r\n':
+                    break
+                line = line.lower()
+                if line.startswith(b'content-length:'):
+                    content_length = int(line[15:])
+                elif line.startswith(b'connection:') and b'close' in line:
+                    keep_alive = False
+            if content_length is None or content_length > len(self.buffer):
+                raise OSError(f"Unsupported response (content length: {content_length})")
+
+            # body: read directly into the preallocated buffer
+            mv = memoryview(self.buffer)
+            n = 0
+            while n < content_length:
+                r = sock.readinto(mv[n:content_length])
+                if not r:
+                    raise OSError("Connection closed by the server")
+                n += r
+        except Exception as e:
+            self.close(host, port)
+            raise e
+
+        if not keep_alive:
+            self.close(host, port)
+        return status_code, mv[:content_length]
+
+
+# Example usage
+if __name__ == "__main__":
+    tls, host, port, path = split_url('http://example.com/')
+    request = build_get_request(host, path)
+    session = Session(buffer_size=2048)
+    try:
+        for _ in range(2): # the second request reuses the same connection
+            status_code, body = session.request(host, port, request, tls=tls)
+            print(status_code, len(body))
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        session.close_all()
@@ -15,21 +15,24 @@ import time
 import sys
 sys.path.append('/modules')
 '''
-from simple_logging import Logger  # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER  # Import the Logger class
 
 class LED:
     def __init__(self, pin_number,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 timer = None,
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initializes the LED on a given pin.
 
         :param pin: Pin number to which the LED is connected.
+        :param timer: machine.Timer to drive the non blocking modes; a shared timer can be passed in,
+                      otherwise hardware timer 0 is used.
         """
         try:
             self.led_pin = machine.Pin(pin_number, machine.Pin.OUT)
             self.sudden_blinking = False  # Flag to track if sudden blinking should continue
             self.flashing = False  # Specific flag for flashing mode
-            self.timer = machine.Timer(0)  # Initialize timer on timer 0
+            self.timer = timer if timer is not None else machine.Timer(0)  # Initialize timer on timer 0 unless a shared one is given
             self.is_available = True
             logger.info("LED initialized successfully.")
         except Exception as e:
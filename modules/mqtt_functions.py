@@ -113,10 +113,12 @@ disconnecting and then reconnectiong may be more power efficient.
 '''
 
 from umqtt.simple import MQTTClient
+import machine
+import usocket
 
 from custom_exceptions import MQTTPublishingError
 
-from simple_logging import Logger  # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER  # Import the Logger class
 
 
 '''
@@ -163,7 +165,7 @@ class MQTTCallbackHandler:
 
 # 2. callback handler
 class CallbackHandler:
-    def __init__(self, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+    def __init__(self, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         self.logger = logger
         
     # callback function
@@ -184,7 +186,7 @@ class CallbackHandler:
 # Initialize mqtt client
 def init_mqtt(client_id, broker, port, user, password, keepalive,
               will_feed, will_message, callback,
-              logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+              logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Initialize the MQTT client."""
     try:
         client = MQTTClient(
@@ -198,6 +200,7 @@ def init_mqtt(client_id, broker, port, user, password, keepalive,
         
         # callback function for when we receive a message on the subscribed feed
         client.set_callback(callback)
+        client.hostname = broker # [client.server is pointed at the broker's cached ip address, see connect_and_subscribe()]
         return client
     except Exception as e:
         logger.error(f"Failed to initialize MQTT client: {e}")
@@ -215,7 +218,7 @@ If the exception is not handled, the program will crash, and no further code wil
 '''
     
 # Connect mqtt client
-def connect_mqtt(client, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def connect_mqtt(client, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Connect to MQTT broker"""
     try:
         client.connect()
@@ -226,7 +229,7 @@ def connect_mqtt(client, logger: Logger = Logger()): # logger is expected to be
         return None
     
 # Disconnect mqtt client
-def disconnect_mqtt(client, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def disconnect_mqtt(client, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Disconnect to MQTT broker"""
     try:
         client.disconnect()
@@ -235,7 +238,7 @@ def disconnect_mqtt(client, logger: Logger = Logger()): # logger is expected to
         logger.error(f"An error occurred during MQTT disconnect: {e}")
 
 # Subscribe to a feed
-def subscribe_feed(client, feed, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def subscribe_feed(client, feed, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     '''function to subscribe to a feed to receive message'''
     try:
         client.subscribe(feed, qos = 2)
@@ -243,11 +246,52 @@ def subscribe_feed(client, feed, logger: Logger = Logger()): # logger is expecte
     except Exception as e:
         logger.error(f"Failed to subscribe to feed {feed}: {e}", publish = True)
 
+# the broker's ip address is cached after a successful connect, in the rtc memory [which survives the soft resets and machine.reset()];
+# the reconnects then connect to it directly, rather than looking the broker's hostname up (dns) each time
+# format: b"<hostname> <ip>" [so that the cache of some other broker is not used]
+def cached_broker_ip(hostname):
+    '''returns the cached ip address of the given broker hostname, or None'''
+    try:
+        host, _, ip = machine.RTC().memory().partition(b" ")
+        if ip and host == hostname.encode():
+            return ip.decode()
+    except Exception:
+        pass
+    return None
+
+def cache_broker_ip(hostname, ip):
+    '''caches the ip address of the given broker hostname [ip=None clears the cache]'''
+    try:
+        machine.RTC().memory(hostname.encode() + b" " + ip.encode() if ip else b"")
+    except Exception:
+        pass
+
 # connect mqtt client and subscribe to given feeds
-def connect_and_subscribe(client, feeds, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+# with clean_session=False, the broker keeps our session (subscriptions and the queued qos 1/2 messages) across the disconnections;
+# so if it still has the session [i.e. 'session present' in its CONNACK], the subscriptions are not sent again
+# NOTE: the session is tied to the client_id, so it must stay the same across the boots
+def connect_and_subscribe(client, feeds, clean_session=True,
+                          logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     '''function to connect to mqtt and subscribe to given feeds'''
     try:
-        client.connect()
+        hostname = client.hostname
+        ip = cached_broker_ip(hostname)
+        try:
+            client.server = ip or usocket.getaddrinfo(hostname, client.port)[0][-1][0]
+            session_present = client.connect(clean_session=clean_session)
+        except OSError:
+            if not ip:
+                raise
+            # the broker may have moved to another address; so look its hostname up afresh
+            cache_broker_ip(hostname, None)
+            ip = None
+            client.server = usocket.getaddrinfo(hostname, client.port)[0][-1][0]
+            session_present = client.connect(clean_session=clean_session)
+        if not ip:
+            cache_broker_ip(hostname, client.server)
+        if session_present:
+            logger.info("Connected to MQTT broker and resumed the previous session.", publish = True)
+            return client
         for feed in feeds:
             client.subscribe(feed, qos = 2)
         logger.info(f"Connected to MQTT broker and Subscribed to feeds: {feeds}", publish = True)
@@ -257,18 +301,59 @@ def connect_and_subscribe(client, feeds, logger: Logger = Logger()): # logger is
         return None
     
 # Publish data to mqtt server
-def publish_data(client, data, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def publish_data(client, data, frame=None, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     # data is expected to be a dictionary {"feed": "msg"}
+    # or a list of [feed, msg] pairs [feed may be str or bytes-like]
+    # frame (optional) is a preallocated bytearray: if given, the data must be bytes-like and is published as a batch
     ''' publish the given data to their corresponding feeds'''
     try:
-        for feed, msg in data.items():
-            if feed:
+        if frame is not None:
+            publish_batch(client, data, frame)
+            return
+        for feed, msg in (data.items() if isinstance(data, dict) else data):
+            if feed and msg is not None: # skip unset values
                 client.publish(feed, msg, qos=0)
     except Exception as e:
         logger.error(f"Publishing data failed: {e}")
         raise MQTTPublishingError("MQTT Data Publishing Failed")
 
 
+# compose the (QoS 0) PUBLISH packets of all the [feed, msg] pairs back to back into the preallocated frame, and send them with
+# a single socket write [rather than 3 writes per feed as in client.publish()]; if the frame gets full, it is sent and reused
+# NOTE: feeds and msgs must be bytes-like [see umqtt.simple's publish() for the packet format]
+def publish_batch(client, data, frame):
+    # check_msg() leaves the socket non-blocking, where a write may send only a part of the frame [leaving a truncated packet
+    # in the stream]; in blocking mode a write returns only once all of it is sent
+    client.sock.setblocking(True)
+    n = 0
+    for feed, msg in data:
+        if not feed or msg is None: # skip unset values
+            continue
+        size = 2 + len(feed) + len(msg) # remaining length: topic length (2 bytes) + topic + payload
+        if size + 5 > len(frame): # can never fit in the frame
+            client.publish(feed, msg, qos=0)
+            continue
+        if n + size + 5 > len(frame): # frame is full; so send it and start over
+            client.sock.write(memoryview(frame)[:n])
+            n = 0
+        frame[n] = 0x30 # PUBLISH, QoS 0
+        n += 1
+        while size > 0x7F: # remaining length as a variable length integer
+            frame[n] = (size & 0x7F) | 0x80
+            size >>= 7
+            n += 1
+        frame[n] = size
+        frame[n + 1] = len(feed) >> 8
+        frame[n + 2] = len(feed) & 0xFF
+        n += 3
+        frame[n:n + len(feed)] = feed
+        n += len(feed)
+        frame[n:n + len(msg)] = msg
+        n += len(msg)
+    if n:
+        client.sock.write(memoryview(frame)[:n])
+
+
 # Example usage
 if __name__ == "__main__":
     import connect_wifi
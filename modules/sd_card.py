@@ -4,11 +4,11 @@ from machine import Pin, SPI
 import sdcard
 from os import VfsFat, mount, umount
 
-from simple_logging import Logger  # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER  # Import the Logger class
 
 class SDCard:
     def __init__(self, spi_pin_miso, spi_pin_mosi, spi_pin_sck, spi_pin_cs,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         # initialize sdcard
         try: 
             # Initialize SPI communication
@@ -33,7 +33,7 @@ class SDCard:
             raise # raise if initialization failed to let the caller know about it
 
     # unmount the sd card
-    def unmount_sd_card(self, logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+    def unmount_sd_card(self, logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         try:
             umount('/sd')
             logger.info("SD card unmounted successfully.")
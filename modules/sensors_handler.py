@@ -11,20 +11,22 @@ from bmp280_sensor import * # Import bmp280 sensor driver
 from ds18b20_sensor import DS18B20 # Import ds18b20 sensor driver
 
 
-from simple_logging import Logger
+from machine import I2C, Pin
+
+from simple_logging import Logger, DEFAULT_LOGGER
 
 class Sensors:
-    def __init__(self, i2cPins: tuple = None, i2c_freq: int = 100000,
+    def __init__(self, i2cPins: tuple = None, i2c_freq: int = 400000,
                  softi2cPins: tuple = None, softi2c_freq: int = 100000,
                  spiPins: tuple = None, spi_baudrate: int = 10000000,
                  onewirePin: int = None,
                  maxFailures: int = 5,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initializes all the sensors.
 
         :param i2cPins: GPIO pin for I2C bus (scl, sda)
-        :param i2c_freq: freq for I2C bus (100kHz by deault - a good value for reliable and non high speed measurement)
+        :param i2c_freq: freq for I2C bus (400kHz by default - supported by both aht25 and bmp280)
         :param softi2cPins: GPIO pin for Soft I2C bus (scl, sda)
         :param softi2c_freq: freq for SoftI2C bus (100kHz by deault - a good value for reliable and non high speed measurement)
         :param spiPins: GPIO Pins for SPI communication
@@ -53,14 +55,21 @@ class Sensors:
                     failures: continuous failures during sensor reading
             '''
             self.sensor_data = {}
+            # a single hardware I2C bus shared by all the sensors on it [rather than each sensor re-initializing the same peripheral]
+            self.i2c = None
+            if self.i2cPins is not None:
+                try:
+                    self.i2c = I2C(0, scl=Pin(self.i2cPins[0]), sda=Pin(self.i2cPins[1]), freq=self.i2c_freq)
+                except Exception as e:
+                    self.logger.error(f"Failed to initialize the I2C bus: {e}")
             if self.i2cPins is not None:
                 try:
-                    self.aht25 = AHT25(self.i2cPins[0], self.i2cPins[1], i2c_freq=100000, i2c_address=0x38, logger=logger)
+                    self.aht25 = AHT25(self.i2cPins[0], self.i2cPins[1], i2c_freq=self.i2c_freq, i2c=self.i2c, i2c_address=0x38, logger=self.logger)
                 except:
                     self.aht25 = None
                 self.sensor_data["aht25"] = {"object": self.aht25, "status": self.aht25!=None, "failures": 0}
                 try:
-                    self.bmp280 = BMP280Driver(self.i2cPins[0], self.i2cPins[1], i2c_freq=100000, i2c_address=0x76, use_case=BMP280_CASE_WEATHER, logger=logger)
+                    self.bmp280 = BMP280Driver(self.i2cPins[0], self.i2cPins[1], i2c_freq=self.i2c_freq, i2c=self.i2c, i2c_address=0x76, use_case=BMP280_CASE_WEATHER, logger=self.logger)
                 except:
                     self.bmp280 = None
                 self.sensor_data["bmp280"] = {"object": self.bmp280, "status": self.bmp280!=None, "failures": 0}
@@ -155,7 +164,7 @@ class Sensors:
                         # Reinitialize the sensor
                         if sensor_name == "aht25":
                             try:
-                                self.aht25 = AHT25(self.i2cPins[0], self.i2cPins[1], i2c_freq=100000, i2c_address=0x38, logger=logger)
+                                self.aht25 = AHT25(self.i2cPins[0], self.i2cPins[1], i2c_freq=self.i2c_freq, i2c=self.i2c, i2c_address=0x38, logger=self.logger)
                                 self.sensor_data[sensor_name]["object"] = self.aht25
                                 if any(self.aht25.read_measurements()): # Validate reinitialization
                                     self.sensor_data[sensor_name]["status"] = True
@@ -172,7 +181,7 @@ class Sensors:
                                 self.logger.error(f"{sensor_name.upper()} could not be reinitialized: {e}")
                         elif sensor_name == "bmp280":
                             try:
-                                self.bmp280 = BMP280Driver(self.i2cPins[0], self.i2cPins[1], i2c_freq=100000, i2c_address=0x76, use_case=BMP280_CASE_WEATHER, logger=logger)
+                                self.bmp280 = BMP280Driver(self.i2cPins[0], self.i2cPins[1], i2c_freq=self.i2c_freq, i2c=self.i2c, i2c_address=0x76, use_case=BMP280_CASE_WEATHER, logger=self.logger)
                                 self.sensor_data[sensor_name]["object"] = self.bmp280
                                 if any(self.bmp280.read_measurements()):  # Validate reinitialization
                                     self.sensor_data[sensor_name]["status"] = True
@@ -189,7 +198,7 @@ class Sensors:
                                 self.logger.error(f"{sensor_name.upper()} could not be reinitialized: {e}")
                         elif sensor_name == "sht40":
                             try:
-                                self.sht40 = SHT40(self.softi2cPins[0], self.softi2cPins[1], i2c_freq=100000, i2c_address=0x44, logger=logger)
+                                self.sht40 = SHT40(self.softi2cPins[0], self.softi2cPins[1], i2c_freq=100000, i2c_address=0x44, logger=self.logger)
                                 self.sensor_data[sensor_name]["object"] = self.sht40
                                 if any(self.sht40.read_measurements()):  # Validate reinitialization
                                     self.sensor_data[sensor_name]["status"] = True
@@ -206,7 +215,7 @@ class Sensors:
                                 self.logger.error(f"{sensor_name.upper()} could not be reinitialized: {e}")
                         elif sensor_name == "ds18b20":
                             try:
-                                self.ds18b20 = DS18B20(self.onewirePin, logger=logger)
+                                self.ds18b20 = DS18B20(self.onewirePin, logger=self.logger)
                                 self.sensor_data[sensor_name]["object"] = self.ds18b20
                                 if self.ds18b20.read_temp():  # Validate reinitialization
                                     self.sensor_data[sensor_name]["status"] = True
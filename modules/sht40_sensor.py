@@ -58,11 +58,11 @@ sys.path.append('/modules')
 '''
 import sht4x  # Import the sht4x library
 
-from simple_logging import Logger
+from simple_logging import Logger, DEFAULT_LOGGER
 
 class SHT40:
     def __init__(self, i2c_scl, i2c_sda, i2c_freq=100000, i2c_address=0x44,
-                 logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                 logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
         """
         Initializes the SHT40 sensor.
 
@@ -2,6 +2,7 @@
 
 from time import localtime
 import os
+import sys
 
 '''
 DEBUG: Detailed information, typically of interest only when diagnosing problems.
@@ -12,6 +13,8 @@ CRITICAL: A serious error, indicating that the program itself may be unable to c
 '''
 
 class Logger:
+    PUBLISH_QUEUE_SIZE = 8 # max number of log entries waiting to be published over MQTT
+    
     def __init__(self, log_file=None, mqtt_client=None, mqtt_feed = None,
                  debug_mode=True, max_size_bytes=100 * 1024, log_level='NOTSET',
                  ds3231rtc=None):
@@ -41,6 +44,12 @@ class Logger:
             'CRITICAL': 5
         }
         self.set_log_level(log_level)
+        # fixed size ring of the log entries to be published over MQTT [publishing is deferred to publish_pending(),
+        # so that a log call in an error path, e.g. of a failed publish, never publishes (and fails) itself]
+        self.publish_queue = [None] * Logger.PUBLISH_QUEUE_SIZE
+        self.queue_read = 0 # index of the next entry to publish
+        self.queue_write = 0 # index of the next free slot
+        self.discards = 0 # number of entries dropped because the queue was full
 
     def set_log_level(self, log_level):
         """
@@ -86,9 +95,9 @@ class Logger:
         if self.log_file:
             self.log_to_file(log_entry)
         
-        # Publish via MQTT if requested
+        # Queue for publishing via MQTT if requested
         if publish and self.mqtt_client and self.mqtt_feed:
-            self.publish_to_mqtt(log_entry)
+            self.queue_for_publish(log_entry)
             
     def info(self, message, publish=False):
         """Log an INFO message."""
@@ -110,6 +119,58 @@ class Logger:
         """Log a DEBUG message."""
         self.log('DEBUG', message, publish)
     
+    def exception(self, message, exc, publish=False):
+        """
+        Log an ERROR message for a caught exception, followed by its traceback on the console and in the log file.
+        
+        :param message: The log message to record
+        :param exc: The caught exception
+        :param publish: Flag to publish the log to MQTT [only the message and the exception, not the traceback]
+        """
+        # Only log messages above the current log level [checked before the exception is formatted at all]
+        if self.level_map['ERROR'] < self.current_level:
+            return
+        
+        self.log('ERROR', f"{message}: {exc}", publish)
+        
+        # the traceback is written straight into the console/file stream, without building an intermediate string
+        if self.debug_mode:
+            sys.print_exception(exc)
+        if self.log_file:
+            try:
+                with open(self.log_file, 'a') as f:
+                    sys.print_exception(exc, f)
+            except Exception as e:
+                if self.debug_mode:
+                    print(f"Failed to log to file: {e}")
+    
+    def flush(self, timeout_ms=1000, disconnect=False):
+        """
+        Makes sure that the logged messages are out, e.g. right before a reset [instead of sleeping for a fixed time].
+        Syncs the filesystem, publishes the queued log entries, and waits (at most timeout_ms) for the MQTT broker to answer a ping;
+        since tcp keeps the order, the answer also means that the log messages published before it have reached the broker.
+        NOTE: it leaves the MQTT socket in blocking mode, so it is meant to be called just before a reset.
+        
+        :param timeout_ms: Maximum time to wait for the MQTT broker in milliseconds
+        :param disconnect: Also disconnect cleanly from the MQTT broker [for an intended reset, so that the broker does not publish the last will]
+        """
+        try:
+            os.sync()
+        except Exception:
+            pass
+        
+        if self.mqtt_client and self.mqtt_client.sock:
+            self.publish_pending()
+            try:
+                self.mqtt_client.sock.settimeout(timeout_ms / 1000)
+                self.mqtt_client.ping()
+                self.mqtt_client.wait_msg() # returns on the ping response [or on an incoming message received before it]
+                if disconnect:
+                    self.mqtt_client.disconnect()
+            except Exception as e:
+                if self.debug_mode:
+                    print(f"Failed to flush MQTT: {e}")
+    
     def log_to_file(self, log_entry):
         """Writes log entry to the file."""
         try:
@@ -152,10 +213,34 @@ class Logger:
         except Exception as e:
             print(f"Error cleaning old log files: {e}")
     
-    def publish_to_mqtt(self, log_entry):
-        """Publishes log entry to MQTT."""
-        try:
-            self.mqtt_client.publish(self.mqtt_feed, log_entry)
-        except Exception as e:
-            if self.debug_mode:
-                print(f"Failed to publish to MQTT: {e}")
+    def queue_for_publish(self, log_entry):
+        """Queues a log entry to be published to MQTT by publish_pending(); if the queue is full, the oldest entry is dropped."""
+        write = (self.queue_write + 1) % Logger.PUBLISH_QUEUE_SIZE
+        if write == self.queue_read: # full
+            self.publish_queue[self.queue_read] = None
+            self.queue_read = (self.queue_read + 1) % Logger.PUBLISH_QUEUE_SIZE
+            self.discards += 1
+        self.publish_queue[self.queue_write] = log_entry
+        self.queue_write = write
+    
+    def publish_pending(self, max_count=PUBLISH_QUEUE_SIZE):
+        """
+        Publishes (at most max_count of) the queued log entries to MQTT, in order; call it when the MQTT connection is healthy.
+        Stops at the first failure, keeping the rest of the entries queued.
+        """
+        count = 0
+        while self.queue_read != self.queue_write and count < max_count:
+            try:
+                self.mqtt_client.publish(self.mqtt_feed, self.publish_queue[self.queue_read])
+            except Exception as e:
+                if self.debug_mode:
+                    print(f"Failed to publish to MQTT: {e}")
+                return
+            self.publish_queue[self.queue_read] = None
+            self.queue_read = (self.queue_read + 1) % Logger.PUBLISH_QUEUE_SIZE
+            count += 1
+
+
+# the default logger of the functions and classes that are not given one [a single shared instance, rather than
+# each 'logger: Logger = Logger()' default argument constructing its own Logger at import]
+DEFAULT_LOGGER = Logger()
@@ -4,11 +4,12 @@ import machine
 import os
 import gc
 from time import sleep
+from random import random
 
-from simple_logging import Logger  # Import the Logger class
+from simple_logging import Logger, DEFAULT_LOGGER  # Import the Logger class
 
 # Get the cause of the reset
-def reset_cause(logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def reset_cause(logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     try:
         rst_cause = machine.reset_cause()
         causes = {
@@ -29,9 +30,34 @@ def reset():
     '''reset the microcontroller'''
     machine.reset()
 
+# WATCHDOG [hardware watchdog timer: resets the microcontroller if it is not fed within its timeout, i.e. if the program hangs]
+# NOTE: once enabled it can not be disabled again; so every long wait must feed it [see watchdog_sleep()]
+watchdog = None
+
+def enable_watchdog(timeout_ms,
+                    logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
+    """Enable the hardware watchdog timer with the given timeout."""
+    global watchdog
+    watchdog = machine.WDT(timeout=timeout_ms)
+    logger.info(f"Watchdog enabled with a timeout of {timeout_ms / 1000} seconds.")
+
+def feed_watchdog():
+    """Feed the watchdog timer, if enabled."""
+    if watchdog:
+        watchdog.feed()
+
+def watchdog_sleep(seconds, step=10):
+    """Sleep for the given seconds in steps of at most 'step' seconds, feeding the watchdog (if enabled) in between."""
+    while seconds > 0:
+        feed_watchdog()
+        s = min(seconds, step)
+        sleep(s)
+        seconds -= s
+    feed_watchdog()
+
 # Light sleep [program continues after waking from light sleep]
 def light_sleep(duration_ms,
-                logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Put the microcontroller into light sleep for the specified duration."""
     if duration_ms > 0:
         logger.info(f"Light sleeping for {duration_ms / 1000} seconds...")
@@ -41,7 +67,7 @@ def light_sleep(duration_ms,
         
 # DEEP sleep [program restarts after waking from deep sleep]
 def deep_sleep(duration_ms,
-               logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+               logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     """Put the microcontroller into deep sleep for the specified duration."""
     '''Currently, deep_sleep logs before entering sleep. If power is lost before deep sleep, the message is not persisted.'''
     '''Improvement: Flush logs before sleeping using os.sync().'''
@@ -51,9 +77,16 @@ def deep_sleep(duration_ms,
         # Set the time (in ms) for deep sleep
         machine.deepsleep(duration_ms)
 
+# exponential backoff delay (in sec) for the given attempt (0, 1, 2, ...), capped at max_delay and randomly spread by +-jitter
+# [the random spread ("wobble": t + t*(r - 0.5)*2*jitter) keeps many devices from retrying in lock-step after a shared outage]
+def backoff_delay(base, attempt, jitter=0.25, max_delay=300):
+    delay = min(base * (1 << attempt), max_delay)
+    return delay + delay * (random() - 0.5) * 2 * jitter
+
 # Retry logic with backoff for any function
 def retry_with_backoff(function, *args,
-                       max_retries=5, backoff_base=10, logger: Logger = Logger(), # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+                       max_retries=5, backoff_base=10, jitter=0.25, max_delay=300,
+                       logger: Logger = DEFAULT_LOGGER, # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
                        **kwargs):
     # *args, **kwargs are the arguments, ketword arguments of the function
     """Generalized retry logic with exponential backoff."""
@@ -62,6 +95,8 @@ def retry_with_backoff(function, *args,
         *args, **kwargs = arguments, keyword aruments for the function
         max_retries = 5  # Max connection retries before long sleep
         backoff_base = 10  # Base seconds for exponential backoff
+        jitter = 0.25  # each delay is randomly spread by +-25% [see backoff_delay()]
+        max_delay = 300  # Cap the delay at 5 minutes
         logger = an instance of Logger class
     '''
     retry_count = 0
@@ -72,20 +107,20 @@ def retry_with_backoff(function, *args,
             result = function(*args, **kwargs)
             if result:
                 return result # function executed successfully, no retries needed, just return the function result
-            sleep_time = min(backoff_base * (2 ** retry_count), 300)  # Cap at 5 minutes
+            sleep_time = backoff_delay(backoff_base, retry_count, jitter, max_delay)
             logger.warning(f"{function.__name__} failed during retry {retry_count + 1}. Retrying in {sleep_time} seconds...")
-            sleep(sleep_time)
+            watchdog_sleep(sleep_time)
             retry_count += 1
         except Exception as e:
-            sleep_time = min(backoff_base * (2 ** retry_count), 300)  # Cap at 5 minutes
+            sleep_time = backoff_delay(backoff_base, retry_count, jitter, max_delay)
             logger.error(f"Error during retry {retry_count + 1} of {function.__name__}: {e}. Retrying in {sleep_time} seconds...")
-            sleep(sleep_time)
+            watchdog_sleep(sleep_time)
             retry_count += 1
     logger.critical(f"Max retries reached for {function.__name__}. Take the appropriate measure.")
     return None # return None to let the caller know that all retries failed 
 
 # log the memory status
-def log_memory(logger: Logger = Logger()): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of Logger()]
+def log_memory(logger: Logger = DEFAULT_LOGGER): # logger is expected to be of type Logger (i.e. an instance of Logger class) [with default value of DEFAULT_LOGGER]
     try:
         free_memory = gc.mem_free()
         logger.info(f"Free memory: {free_memory}")